@@ -1,33 +1,64 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, Query
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, Query, BackgroundTasks
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteMany, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 import os
+import asyncio
 import logging
 import re
 from pathlib import Path
+from urllib.parse import quote
+from yarl import URL
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import uuid
+import secrets
+import hashlib
+import hmac
+import itertools
+import time
 from datetime import datetime, timezone, timedelta
+from email.utils import parsedate_to_datetime
+from cachetools import TTLCache
+from cryptography.fernet import Fernet, InvalidToken
 import jwt
+from jwt.algorithms import get_default_algorithms
+from jwt.utils import base64url_encode
 import bcrypt
 import httpx
 import zipfile
-import io
+import tarfile
 import base64
 import json
+import orjson
+import tiktoken
+import zstandard
+from emergentintegrations.llm.chat import LlmChat, UserMessage
 import aiofiles
 import shutil
 import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# Bounded pool with warm connections; waits for a free connection fail fast
+# instead of queueing indefinitely under bursts
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=50,
+    minPoolSize=10,
+    waitQueueTimeoutMS=2000,
+    serverSelectionTimeoutMS=3000,
+    retryWrites=True,
+    compressors="zstd"
+)
 db = client[os.environ['DB_NAME']]
 
 # JWT Settings
@@ -35,17 +66,109 @@ JWT_SECRET = os.environ.get('JWT_SECRET', 'devai-super-secret-key')
 JWT_ALGORITHM = os.environ.get('JWT_ALGORITHM', 'HS256')
 JWT_EXPIRATION_HOURS = int(os.environ.get('JWT_EXPIRATION_HOURS', 24))
 REFRESH_TOKEN_EXPIRATION_DAYS = int(os.environ.get('REFRESH_TOKEN_EXPIRATION_DAYS', 7))
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 10))
 
 # GitHub OAuth Settings
 GITHUB_CLIENT_ID = os.environ.get('GITHUB_CLIENT_ID', '')
 GITHUB_CLIENT_SECRET = os.environ.get('GITHUB_CLIENT_SECRET', '')
 GITHUB_REDIRECT_URI = os.environ.get('GITHUB_REDIRECT_URI', '')
+OAUTH_STATE_TTL_SECONDS = 600
+# Fernet key for GitHub access tokens at rest; without one they are stored as-is
+GITHUB_TOKEN_KEY = os.environ.get('GITHUB_TOKEN_KEY', '')
+_github_token_fernet = Fernet(GITHUB_TOKEN_KEY) if GITHUB_TOKEN_KEY else None
+# Static part of the GitHub authorize URL; only the state varies per request
+GITHUB_AUTH_URL_PREFIX = (
+    "https://github.com/login/oauth/authorize"
+    "?client_id=" + quote(GITHUB_CLIENT_ID, safe='') +
+    "&redirect_uri=" + quote(GITHUB_REDIRECT_URI, safe='') +
+    "&scope=repo%20user"
+    "&state="
+)
 
 # LLM Key
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY', '')
+# Caps concurrent LLM calls so bursts queue here instead of at the provider
+LLM_CONCURRENCY = int(os.environ.get('LLM_CONCURRENCY', 16))
+llm_semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+# Most file-context tokens sent with a project analysis prompt
+ANALYSIS_TOKEN_BUDGET = 8000
+# tiktoken encoding, loaded on first use; False once loading has failed
+_token_encoding = None
+
+# Shared GitHub HTTP client, created on startup and closed on shutdown so
+# every request reuses pooled keep-alive connections to GitHub
+GITHUB_API_URL = "https://api.github.com"
+github_http: Optional[httpx.AsyncClient] = None
+
+# Upper bound for a group of GitHub calls made together in one handler
+GITHUB_FETCH_TIMEOUT_SECONDS = 8
+# Blob and tree writes for a multi-file commit can be slow on large files
+GITHUB_COMMIT_TIMEOUT = httpx.Timeout(60.0, connect=2.0)
+# Concurrent blob uploads per commit; GitHub's secondary rate limits punish
+# large bursts of simultaneous writes from one token
+GITHUB_BLOB_CONCURRENCY = 16
+
+# When a token has fewer calls than this left, its next calls wait for the
+# quota reset instead of spending the rest on requests GitHub will refuse
+GITHUB_RATE_LIMIT_FLOOR = 10
+# Longest pause (seconds) for a rate limit; beyond it calls go out and fail fast
+GITHUB_MAX_RATE_LIMIT_WAIT = 30
+GITHUB_RATE_LIMIT_RETRIES = 2
+# token digest -> epoch seconds until which that token's calls should wait
+_github_paused_until = TTLCache(maxsize=10000, ttl=3600)
+
+# Expiring GitHub user tokens are renewed once they are this close (seconds) to expiry
+GITHUB_TOKEN_REFRESH_MARGIN = 300
+# user_id -> lock held while that user's GitHub token is being refreshed
+_github_refresh_locks = TTLCache(maxsize=1000, ttl=600)
+# Users whose last refresh attempt failed; not retried until the entry expires
+GITHUB_REFRESH_RETRY_SECONDS = 300
+_github_refresh_failed = TTLCache(maxsize=10000, ttl=GITHUB_REFRESH_RETRY_SECONDS)
+
+# Optional server-owned GitHub tokens (comma-separated). Reads of public
+# repositories rotate through them so background work leaves the user's quota alone.
+GITHUB_APP_TOKENS = [t.strip() for t in os.environ.get('GITHUB_APP_TOKENS', '').split(',') if t.strip()]
+_github_app_token_turn = itertools.count()
+
+# user_id -> (repos, fetched_at), each repo in the REST /user/repos field
+# names. Entries younger than GITHUB_REPOS_FRESH_SECONDS answer the repo list;
+# older ones still supply metadata when a project is imported from GitHub.
+_github_repos_cache = TTLCache(maxsize=1000, ttl=3600)
+GITHUB_REPOS_FRESH_SECONDS = 60
+
+# (token digest, API path) -> (etag, parsed JSON, fetched_at) for repo
+# metadata and contents. Stale entries are revalidated with If-None-Match,
+# which GitHub answers with a bodyless 304 that does not count against the
+# rate limit.
+_github_response_cache = TTLCache(maxsize=2048, ttl=3600)
+GITHUB_RESPONSE_FRESH_SECONDS = 60
+# Larger bodies (mostly single-file contents) are passed through uncached
+GITHUB_CACHE_MAX_BODY_BYTES = 256 * 1024
+# The repo list comes from GraphQL, which returns only the fields the API
+# exposes instead of REST's full repository objects
+GITHUB_REPOS_QUERY = """
+query($cursor: String) {
+  viewer {
+    repositories(
+      first: 100, after: $cursor,
+      orderBy: {field: UPDATED_AT, direction: DESC},
+      ownerAffiliations: [OWNER, COLLABORATOR, ORGANIZATION_MEMBER]
+    ) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        databaseId name nameWithOwner description url stargazerCount isPrivate
+        primaryLanguage { name }
+        defaultBranchRef { name }
+      }
+    }
+  }
+}
+"""
+# Pages of 100 repos fetched per listing
+GITHUB_REPOS_MAX_PAGES = 10
 
 # Create the main app
-app = FastAPI(title="DevAI - AI Software Developer")
+app = FastAPI(title="DevAI - AI Software Developer", default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -53,6 +176,44 @@ api_router = APIRouter(prefix="/api")
 # Security
 security = HTTPBearer()
 
+# bcrypt releases the GIL, so a dedicated pool hashes passwords in parallel
+# without competing with Motor and asyncio.to_thread for the default executor
+bcrypt_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="bcrypt")
+
+# Uploads above this size are scanned in a separate process, so zip
+# decompression gets its own core instead of contending for the GIL
+ZIP_PROCESS_SCAN_THRESHOLD = 50 * 1024 * 1024
+# Threads per scan that decompress the stored files' contents
+ZIP_READ_WORKERS = 4
+# GitHub repos are sampled for analysis from one tarball download; larger
+# archives fall back to the root directory listing
+GITHUB_TARBALL_MAX_BYTES = 50 * 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', 200 * 1024 * 1024))
+zip_scan_pool: Optional[ProcessPoolExecutor] = None
+
+# Base64 payloads above this size are encoded or decoded in a worker thread
+BASE64_INLINE_LIMIT = 64 * 1024
+
+# JWT signer and key are prepared once instead of on every encode/decode
+_JWT_SIGNER = get_default_algorithms()[JWT_ALGORITHM]
+_JWT_KEY = _JWT_SIGNER.prepare_key(JWT_SECRET)
+_JWT_HEADER_SEGMENT = base64url_encode(
+    json.dumps({"alg": JWT_ALGORITHM, "typ": "JWT"}, separators=(",", ":")).encode('utf-8')
+)
+
+# Verified access tokens -> (user_id, exp), keyed by a digest of the raw token
+_auth_cache = TTLCache(maxsize=50000, ttl=60)
+# Rejected tokens -> 401 detail, so clients polling with a stale token
+# are turned away without decoding it again
+_auth_rejections = TTLCache(maxsize=10000, ttl=60)
+# user_id -> user document, shared by all of a user's tokens and dropped
+# whenever the document changes
+_user_cache = TTLCache(maxsize=50000, ttl=60)
+
+# user_id -> (sha256(password + user_id), bcrypt hash) for recent successful
+# logins, so a repeat login with the same password can skip bcrypt
+_login_cache = TTLCache(maxsize=5000, ttl=300)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -134,6 +295,20 @@ class TaskResponse(BaseModel):
     created_at: str
     updated_at: str
 
+# Task list rows: no ai_response and no file contents; GET /tasks/{task_id}
+# returns the full TaskResponse
+class TaskListItem(BaseModel):
+    id: str
+    project_id: str
+    title: str
+    description: str
+    status: str
+    priority: str
+    pr_id: Optional[str] = None
+    files_changed: List[Dict[str, Any]] = []
+    created_at: str
+    updated_at: str
+
 class FileChange(BaseModel):
     path: str
     content: str
@@ -186,51 +361,379 @@ class GitHubRepoResponse(BaseModel):
 # HELPER FUNCTIONS
 # ======================
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+async def hash_password(password: str) -> str:
+    # bcrypt is CPU-bound; run it on its own pool to keep the event loop free
+    loop = asyncio.get_running_loop()
+    hashed = await loop.run_in_executor(
+        bcrypt_pool, bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+    )
+    return hashed.decode('utf-8')
+
+def password_needs_rehash(hashed: str) -> bool:
+    """True for hashes made at a bcrypt cost other than BCRYPT_ROUNDS"""
+    # bcrypt hashes look like $2b$12$..., with the cost in characters 4-5
+    return hashed[4:6] != f"{BCRYPT_ROUNDS:02d}"
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+async def verify_password(password: str, hashed: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        bcrypt_pool, bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8')
+    )
 
-def create_token(user_id: str, token_type: str = "access") -> str:
+async def decode_base64_text(content: str) -> str:
+    """Decode base64 file content, off the event loop when it is large"""
+    if len(content) < BASE64_INLINE_LIMIT:
+        return base64.b64decode(content).decode("utf-8")
+    decoded = await asyncio.to_thread(base64.b64decode, content)
+    return decoded.decode("utf-8")
+
+async def encode_base64_text(content: str) -> str:
+    """Base64-encode text for the GitHub contents API, off the event loop when it is large"""
+    raw = content.encode("utf-8")
+    if len(raw) < BASE64_INLINE_LIMIT:
+        return base64.b64encode(raw).decode("ascii")
+    encoded = await asyncio.to_thread(base64.b64encode, raw)
+    # Drop the UTF-8 bytes before the ASCII copy is made
+    del raw
+    return encoded.decode("ascii")
+
+def compress_file_content(content: str) -> bytes:
+    return zstandard.compress(content.encode("utf-8"), 3)
+
+def file_content(doc: Dict[str, Any]) -> str:
+    """Text of a project_files document; older documents store it uncompressed"""
+    if "content_z" in doc:
+        return zstandard.decompress(doc["content_z"]).decode("utf-8")
+    return doc.get("content", "")
+
+def encode_jwt(payload: Dict[str, Any]) -> str:
+    """Sign a JWT with the precomputed key; same output as jwt.encode"""
+    claims = {k: int(v.timestamp()) if isinstance(v, datetime) else v for k, v in payload.items()}
+    payload_segment = base64url_encode(json.dumps(claims, separators=(",", ":")).encode('utf-8'))
+    signing_input = _JWT_HEADER_SEGMENT + b"." + payload_segment
+    signature = _JWT_SIGNER.sign(signing_input, _JWT_KEY)
+    return (signing_input + b"." + base64url_encode(signature)).decode('utf-8')
+
+def create_token(
+    user_id: str, token_type: str = "access", now: Optional[datetime] = None, jti: Optional[str] = None
+) -> str:
+    now = now or datetime.now(timezone.utc)
     if token_type == "access":
-        expires = datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
+        expires = now + timedelta(hours=JWT_EXPIRATION_HOURS)
     else:
-        expires = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRATION_DAYS)
+        expires = now + timedelta(days=REFRESH_TOKEN_EXPIRATION_DAYS)
     
     payload = {
         "sub": user_id,
         "exp": expires,
-        "iat": datetime.now(timezone.utc),
-        "type": token_type
+        "iat": now,
+        "type": token_type,
+        # Refresh tokens are stored and looked up by this id rather than the full token
+        "jti": jti or new_id()
     }
-    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    return encode_jwt(payload)
+
+# Fields of the user document that downstream handlers actually read
+CURRENT_USER_PROJECTION = {
+    "_id": 0, "id": 1, "email": 1, "name": 1, "avatar_url": 1,
+    "github_connected": 1, "github_username": 1, "github_access_token": 1,
+    "github_token_expires_at": 1,
+    "settings": 1, "created_at": 1
+}
+
+def _token_cache_key(token: str) -> bytes:
+    return hashlib.blake2b(token.encode('utf-8'), digest_size=16).digest()
+
+def invalidate_user_cache(user_id: str) -> None:
+    """Drop the cached user document so the next request reloads it"""
+    _user_cache.pop(user_id, None)
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        if payload.get("type") != "access":
-            raise HTTPException(status_code=401, detail="Invalid token type")
+    cache_key = _token_cache_key(token)
+    cached = _auth_cache.get(cache_key)
+    if cached:
+        user_id, exp = cached
+        if exp <= time.time():
+            raise HTTPException(status_code=401, detail="Token expired")
+    else:
+        detail = _auth_rejections.get(cache_key)
+        if detail is None:
+            try:
+                payload = jwt.decode(token, _JWT_KEY, algorithms=[JWT_ALGORITHM])
+                if payload.get("type") != "access":
+                    detail = "Invalid token type"
+            except jwt.ExpiredSignatureError:
+                detail = "Token expired"
+            except jwt.InvalidTokenError:
+                detail = "Invalid token"
+            if detail:
+                _auth_rejections[cache_key] = detail
+        if detail:
+            raise HTTPException(status_code=401, detail=detail)
         user_id = payload.get("sub")
-        user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+        _auth_cache[cache_key] = (user_id, payload["exp"])
+    
+    user = _user_cache.get(user_id)
+    if user is None:
+        user = await db.users.find_one({"id": user_id}, CURRENT_USER_PROJECTION)
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
-        return user
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+        # Decrypted once per cache fill, so GitHub handlers read it from memory
+        user["github_access_token"] = open_github_token(user.get("github_access_token"))
+        _user_cache[user_id] = user
+    return user
 
-def format_datetime(dt) -> str:
-    if isinstance(dt, str):
-        return dt
-    return dt.isoformat() if dt else datetime.now(timezone.utc).isoformat()
+def new_id() -> str:
+    return uuid.uuid4().hex
 
 # ======================
 # GITHUB SERVICE FUNCTIONS
 # ======================
 
+def seal_github_token(token: str) -> str:
+    """Encrypt a GitHub access token for storage when GITHUB_TOKEN_KEY is set"""
+    if _github_token_fernet is None:
+        return token
+    return _github_token_fernet.encrypt(token.encode('utf-8')).decode('ascii')
+
+def open_github_token(stored: Optional[str]) -> Optional[str]:
+    """Stored GitHub token in plain text; tokens saved before encryption pass through"""
+    if not stored or _github_token_fernet is None or not stored.startswith("gAAAAA"):
+        return stored
+    try:
+        return _github_token_fernet.decrypt(stored.encode('ascii')).decode('utf-8')
+    except InvalidToken:
+        # Sealed with a different key; the user has to reconnect GitHub
+        return None
+
+def github_token_fields(token_data: dict) -> Dict[str, Any]:
+    """User fields for a GitHub token grant; expiring tokens come with a refresh token"""
+    expires_in = token_data.get("expires_in")
+    refresh_token = token_data.get("refresh_token")
+    return {
+        "github_access_token": seal_github_token(token_data["access_token"]),
+        "github_refresh_token": seal_github_token(refresh_token) if refresh_token else None,
+        # Epoch seconds; None for tokens that never expire
+        "github_token_expires_at": time.time() + int(expires_in) if expires_in else None
+    }
+
+async def get_valid_github_token(user: dict) -> Optional[str]:
+    """The user's GitHub token, renewed in place first if it is about to expire"""
+    expires_at = user.get("github_token_expires_at")
+    if not expires_at or expires_at - time.time() > GITHUB_TOKEN_REFRESH_MARGIN:
+        return user.get("github_access_token")
+    if user["id"] in _github_refresh_failed:
+        return user.get("github_access_token")
+    
+    # Refresh tokens are single use, so concurrent requests must not race
+    lock = _github_refresh_locks.setdefault(user["id"], asyncio.Lock())
+    async with lock:
+        stored = await db.users.find_one(
+            {"id": user["id"]},
+            {"_id": 0, "github_access_token": 1, "github_refresh_token": 1, "github_token_expires_at": 1}
+        ) or {}
+        if (stored.get("github_token_expires_at") or 0) - time.time() > GITHUB_TOKEN_REFRESH_MARGIN:
+            # Another request renewed it while this one waited
+            user["github_access_token"] = open_github_token(stored["github_access_token"])
+            user["github_token_expires_at"] = stored["github_token_expires_at"]
+            return user["github_access_token"]
+        
+        refresh_token = open_github_token(stored.get("github_refresh_token"))
+        if not refresh_token or not GITHUB_CLIENT_ID or not GITHUB_CLIENT_SECRET:
+            return user.get("github_access_token")
+        try:
+            response = await github_http.post(
+                "https://github.com/login/oauth/access_token",
+                data={
+                    "client_id": GITHUB_CLIENT_ID,
+                    "client_secret": GITHUB_CLIENT_SECRET,
+                    "grant_type": "refresh_token",
+                    "refresh_token": refresh_token
+                },
+                headers={"Accept": "application/json"}
+            )
+        except httpx.HTTPError as e:
+            logger.warning(f"GitHub token refresh failed for user {user['id']}: {e}")
+            _github_refresh_failed[user["id"]] = True
+            return user.get("github_access_token")
+        token_data = response.json() if response.status_code == 200 else {}
+        if not token_data.get("access_token"):
+            error = token_data.get("error", response.status_code)
+            logger.warning(f"GitHub token refresh failed for user {user['id']}: {error}")
+            _github_refresh_failed[user["id"]] = True
+            if error == "bad_refresh_token":
+                # Revoked or already used; the user has to reconnect GitHub
+                await db.users.update_one(
+                    {"id": user["id"]},
+                    {"$set": {"github_refresh_token": None, "github_token_expires_at": None}}
+                )
+                user["github_token_expires_at"] = None
+            return user.get("github_access_token")
+        
+        fields = github_token_fields(token_data)
+        await db.users.update_one({"id": user["id"]}, {"$set": fields})
+        user["github_access_token"] = token_data["access_token"]
+        user["github_token_expires_at"] = fields["github_token_expires_at"]
+        return user["github_access_token"]
+
+async def get_github_user(current_user: dict = Depends(get_current_user)) -> dict:
+    """Current user with an expiring GitHub token renewed, for handlers that call GitHub"""
+    await get_valid_github_token(current_user)
+    return current_user
+
+def github_headers(token: str) -> Dict[str, str]:
+    return {"Authorization": "Bearer " + token}
+
+def github_read_token(user_token: Optional[str], public: bool) -> Optional[str]:
+    """Token for reading a repo: the next unpaused pooled token if the repo is public"""
+    if not public or not GITHUB_APP_TOKENS:
+        return user_token
+    now = time.time()
+    for _ in range(len(GITHUB_APP_TOKENS)):
+        token = GITHUB_APP_TOKENS[next(_github_app_token_turn) % len(GITHUB_APP_TOKENS)]
+        if _github_paused_until.get(_token_cache_key("Bearer " + token), 0) <= now:
+            return token
+    return user_token
+
+def retry_after_seconds(value: str) -> Optional[float]:
+    """Retry-After in seconds, whether sent as delay-seconds or an HTTP-date"""
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def github_rate_limit_pause(response: httpx.Response) -> Optional[float]:
+    """Seconds GitHub asks this token to wait before its next call, if any"""
+    retry_after = response.headers.get("retry-after")
+    if retry_after and response.status_code in (403, 429):
+        pause = retry_after_seconds(retry_after)
+        if pause is not None:
+            return pause
+    try:
+        remaining = int(response.headers["x-ratelimit-remaining"])
+        reset = int(response.headers["x-ratelimit-reset"])
+    except (KeyError, ValueError):
+        # Missing or malformed headers; the call is not paced
+        return None
+    if remaining < GITHUB_RATE_LIMIT_FLOOR:
+        return max(0.0, reset - time.time())
+    return None
+
+class GitHubRateLimitTransport(httpx.AsyncBaseTransport):
+    """Paces each token's GitHub calls by the rate-limit headers GitHub sends.
+    
+    A token near or over its quota waits for the reset before its next call,
+    and 403/429 answers carrying Retry-After are retried after that delay.
+    Waits longer than GITHUB_MAX_RATE_LIMIT_WAIT are not taken; the call goes
+    out and GitHub's refusal is returned as usual.
+    """
+    
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        authorization = request.headers.get("authorization")
+        if not authorization:
+            return await self._transport.handle_async_request(request)
+        
+        key = _token_cache_key(authorization)
+        for attempt in range(GITHUB_RATE_LIMIT_RETRIES + 1):
+            wait = _github_paused_until.get(key, 0) - time.time()
+            if 0 < wait <= GITHUB_MAX_RATE_LIMIT_WAIT:
+                await asyncio.sleep(wait)
+            
+            response = await self._transport.handle_async_request(request)
+            pause = github_rate_limit_pause(response)
+            if pause is None:
+                return response
+            _github_paused_until[key] = time.time() + pause
+            refused = response.status_code in (403, 429)
+            if not refused or attempt == GITHUB_RATE_LIMIT_RETRIES or pause > GITHUB_MAX_RATE_LIMIT_WAIT:
+                return response
+            await response.aclose()
+    
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+async def github_get_cached(path: str, token: str) -> Tuple[int, Any]:
+    """GET a GitHub API path, serving repeats from a short-lived cache.
+    
+    Stale entries are revalidated with If-None-Match; a 304 reuses the cached
+    body without spending rate-limit quota. Returns (status_code, json).
+    """
+    key = (hashlib.sha1(token.encode('utf-8')).hexdigest()[:16], path)
+    cached = _github_response_cache.get(key)
+    if cached and time.time() - cached[2] < GITHUB_RESPONSE_FRESH_SECONDS:
+        return 200, cached[1]
+    
+    headers = github_headers(token)
+    if cached and cached[0]:
+        headers["If-None-Match"] = cached[0]
+    
+    response = await github_http.get(path, headers=headers)
+    if response.status_code == 304:
+        etag, data = cached[0], cached[1]
+    elif response.status_code != 200:
+        return response.status_code, None
+    else:
+        etag, data = response.headers.get("etag"), response.json()
+        if len(response.content) > GITHUB_CACHE_MAX_BODY_BYTES:
+            return 200, data
+    _github_response_cache[key] = (etag, data, time.time())
+    return 200, data
+
+def cached_github_repo(user_id: str, owner: str, repo: str) -> Optional[Dict[str, Any]]:
+    """A repo from the user's cached repo list, if it is there"""
+    cached = _github_repos_cache.get(user_id)
+    if not cached:
+        return None
+    full_name = f"{owner}/{repo}".lower()
+    return next((r for r in cached[0] if r["full_name"].lower() == full_name), None)
+
+async def fetch_github_repos(token: str) -> Tuple[int, Optional[List[Dict[str, Any]]]]:
+    """The token owner's repos, most recently updated first, via GraphQL.
+    
+    Nodes are mapped onto the REST field names used elsewhere. Returns
+    (status_code, repos); repos is None when any page fails.
+    """
+    repos = []
+    cursor = None
+    for _ in range(GITHUB_REPOS_MAX_PAGES):
+        response = await github_http.post(
+            "/graphql",
+            headers=github_headers(token),
+            json={"query": GITHUB_REPOS_QUERY, "variables": {"cursor": cursor}}
+        )
+        if response.status_code != 200:
+            return response.status_code, None
+        payload = orjson.loads(response.content)
+        if payload.get("errors") or not payload.get("data"):
+            return 502, None
+        
+        page = payload["data"]["viewer"]["repositories"]
+        for node in page["nodes"]:
+            repos.append({
+                "id": node["databaseId"],
+                "name": node["name"],
+                "full_name": node["nameWithOwner"],
+                "description": node["description"],
+                "html_url": node["url"],
+                "language": (node["primaryLanguage"] or {}).get("name"),
+                "stargazers_count": node["stargazerCount"],
+                "private": node["isPrivate"],
+                # Empty repositories have no default branch yet
+                "default_branch": (node["defaultBranchRef"] or {}).get("name", "main")
+            })
+        if not page["pageInfo"]["hasNextPage"]:
+            break
+        cursor = page["pageInfo"]["endCursor"]
+    return 200, repos
+
 class GitHubService:
     """Service for interacting with GitHub API"""
     
@@ -243,24 +746,22 @@ class GitHubService:
     
     async def get_default_branch(self, owner: str, repo: str) -> str:
         """Get the default branch of a repository"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://api.github.com/repos/{owner}/{repo}",
-                headers=self.headers
-            )
-            if response.status_code == 200:
-                return response.json().get("default_branch", "main")
+        response = await github_http.get(
+            f"/repos/{owner}/{repo}",
+            headers=self.headers
+        )
+        if response.status_code == 200:
+            return response.json().get("default_branch", "main")
         return "main"
     
     async def get_branch_sha(self, owner: str, repo: str, branch: str) -> Optional[str]:
         """Get the SHA of a branch"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://api.github.com/repos/{owner}/{repo}/git/refs/heads/{branch}",
-                headers=self.headers
-            )
-            if response.status_code == 200:
-                return response.json()["object"]["sha"]
+        response = await github_http.get(
+            f"/repos/{owner}/{repo}/git/refs/heads/{branch}",
+            headers=self.headers
+        )
+        if response.status_code == 200:
+            return response.json()["object"]["sha"]
         return None
     
     async def create_branch(self, owner: str, repo: str, branch_name: str, from_branch: str = "main") -> bool:
@@ -271,168 +772,191 @@ class GitHubService:
             logger.error(f"Could not get SHA for branch {from_branch}")
             return False
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"https://api.github.com/repos/{owner}/{repo}/git/refs",
-                headers=self.headers,
-                json={
-                    "ref": f"refs/heads/{branch_name}",
-                    "sha": sha
-                }
-            )
-            if response.status_code == 201:
-                logger.info(f"Created branch {branch_name} in {owner}/{repo}")
-                return True
-            else:
-                logger.error(f"Failed to create branch: {response.status_code} - {response.text}")
-                return False
+        response = await github_http.post(
+            f"/repos/{owner}/{repo}/git/refs",
+            headers=self.headers,
+            json={
+                "ref": f"refs/heads/{branch_name}",
+                "sha": sha
+            }
+        )
+        if response.status_code == 201:
+            logger.info(f"Created branch {branch_name} in {owner}/{repo}")
+            return True
+        else:
+            logger.error(f"Failed to create branch: {response.status_code} - {response.text}")
+            return False
     
     async def get_file_content(self, owner: str, repo: str, path: str, branch: str = "main") -> Optional[Dict]:
         """Get file content and SHA from repository"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://api.github.com/repos/{owner}/{repo}/contents/{path}",
-                headers=self.headers,
-                params={"ref": branch}
-            )
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "sha": data.get("sha"),
-                    "content": base64.b64decode(data.get("content", "")).decode("utf-8") if data.get("content") else ""
-                }
+        response = await github_http.get(
+            f"/repos/{owner}/{repo}/contents/{path}",
+            headers=self.headers,
+            params={"ref": branch}
+        )
+        if response.status_code == 200:
+            data = response.json()
+            return {
+                "sha": data.get("sha"),
+                "content": await decode_base64_text(data["content"]) if data.get("content") else ""
+            }
         return None
     
     async def create_or_update_file(self, owner: str, repo: str, path: str, content: str, 
-                                     message: str, branch: str, sha: Optional[str] = None) -> bool:
-        """Create or update a file in the repository"""
-        async with httpx.AsyncClient() as client:
-            # First check if file exists to get its SHA
-            if not sha:
-                existing = await self.get_file_content(owner, repo, path, branch)
-                if existing:
-                    sha = existing["sha"]
-            
-            payload = {
-                "message": message,
-                "content": base64.b64encode(content.encode("utf-8")).decode("utf-8"),
-                "branch": branch
-            }
-            
-            if sha:
-                payload["sha"] = sha
-            
-            response = await client.put(
-                f"https://api.github.com/repos/{owner}/{repo}/contents/{path}",
-                headers=self.headers,
-                json=payload
-            )
-            
-            if response.status_code in [200, 201]:
-                logger.info(f"Successfully {'updated' if sha else 'created'} {path}")
-                return True
-            else:
-                logger.error(f"Failed to create/update file: {response.status_code} - {response.text}")
-                return False
+                                     message: str, branch: str, sha: Optional[str] = None,
+                                     create_only: bool = False) -> bool:
+        """Create or update a file in the repository.
+        
+        Pass create_only=True for files known to be new to skip the lookup of
+        an existing file's SHA; multi-file changes should use
+        commit_multiple_files, which needs no per-file SHAs at all.
+        """
+        # First check if file exists to get its SHA
+        if not sha and not create_only:
+            existing = await self.get_file_content(owner, repo, path, branch)
+            if existing:
+                sha = existing["sha"]
+        
+        payload = {
+            "message": message,
+            "content": await encode_base64_text(content),
+            "branch": branch
+        }
+        
+        if sha:
+            payload["sha"] = sha
+        
+        response = await github_http.put(
+            f"/repos/{owner}/{repo}/contents/{path}",
+            headers=self.headers,
+            json=payload
+        )
+        
+        if response.status_code in [200, 201]:
+            logger.info(f"Successfully {'updated' if sha else 'created'} {path}")
+            return True
+        else:
+            logger.error(f"Failed to create/update file: {response.status_code} - {response.text}")
+            return False
     
     async def commit_multiple_files(self, owner: str, repo: str, branch: str, 
                                      files: List[Dict[str, str]], commit_message: str) -> bool:
         """Commit multiple files in a single commit using Git Data API"""
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
+            async def get_base_commit() -> Optional[Tuple[str, str]]:
                 # 1. Get the current commit SHA of the branch
-                ref_response = await client.get(
-                    f"https://api.github.com/repos/{owner}/{repo}/git/refs/heads/{branch}",
-                    headers=self.headers
+                ref_response = await github_http.get(
+                    f"/repos/{owner}/{repo}/git/refs/heads/{branch}",
+                    headers=self.headers,
+                    timeout=GITHUB_COMMIT_TIMEOUT
                 )
                 if ref_response.status_code != 200:
                     logger.error(f"Failed to get branch ref: {ref_response.text}")
-                    return False
+                    return None
                 
                 current_commit_sha = ref_response.json()["object"]["sha"]
                 
                 # 2. Get the tree SHA of the current commit
-                commit_response = await client.get(
-                    f"https://api.github.com/repos/{owner}/{repo}/git/commits/{current_commit_sha}",
-                    headers=self.headers
+                commit_response = await github_http.get(
+                    f"/repos/{owner}/{repo}/git/commits/{current_commit_sha}",
+                    headers=self.headers,
+                    timeout=GITHUB_COMMIT_TIMEOUT
                 )
                 if commit_response.status_code != 200:
                     logger.error(f"Failed to get commit: {commit_response.text}")
-                    return False
+                    return None
                 
-                base_tree_sha = commit_response.json()["tree"]["sha"]
-                
-                # 3. Create blobs for each file
-                tree_items = []
-                for file_data in files:
-                    blob_response = await client.post(
-                        f"https://api.github.com/repos/{owner}/{repo}/git/blobs",
+                return current_commit_sha, commit_response.json()["tree"]["sha"]
+            
+            blob_slots = asyncio.Semaphore(GITHUB_BLOB_CONCURRENCY)
+            
+            async def create_blob(content: str) -> httpx.Response:
+                async with blob_slots:
+                    return await github_http.post(
+                        f"/repos/{owner}/{repo}/git/blobs",
                         headers=self.headers,
+                        timeout=GITHUB_COMMIT_TIMEOUT,
                         json={
-                            "content": file_data["content"],
+                            "content": content,
                             "encoding": "utf-8"
                         }
                     )
-                    if blob_response.status_code != 201:
-                        logger.error(f"Failed to create blob for {file_data['path']}: {blob_response.text}")
-                        continue
-                    
-                    blob_sha = blob_response.json()["sha"]
-                    tree_items.append({
-                        "path": file_data["path"],
-                        "mode": "100644",
-                        "type": "blob",
-                        "sha": blob_sha
-                    })
-                
-                if not tree_items:
-                    logger.error("No files were successfully processed")
-                    return False
-                
-                # 4. Create a new tree
-                tree_response = await client.post(
-                    f"https://api.github.com/repos/{owner}/{repo}/git/trees",
-                    headers=self.headers,
-                    json={
-                        "base_tree": base_tree_sha,
-                        "tree": tree_items
-                    }
-                )
-                if tree_response.status_code != 201:
-                    logger.error(f"Failed to create tree: {tree_response.text}")
-                    return False
-                
-                new_tree_sha = tree_response.json()["sha"]
-                
-                # 5. Create a new commit
-                new_commit_response = await client.post(
-                    f"https://api.github.com/repos/{owner}/{repo}/git/commits",
-                    headers=self.headers,
-                    json={
-                        "message": commit_message,
-                        "tree": new_tree_sha,
-                        "parents": [current_commit_sha]
-                    }
-                )
-                if new_commit_response.status_code != 201:
-                    logger.error(f"Failed to create commit: {new_commit_response.text}")
-                    return False
-                
-                new_commit_sha = new_commit_response.json()["sha"]
-                
-                # 6. Update the branch reference
-                update_ref_response = await client.patch(
-                    f"https://api.github.com/repos/{owner}/{repo}/git/refs/heads/{branch}",
-                    headers=self.headers,
-                    json={"sha": new_commit_sha}
-                )
-                if update_ref_response.status_code != 200:
-                    logger.error(f"Failed to update ref: {update_ref_response.text}")
-                    return False
-                
-                logger.info(f"Successfully committed {len(tree_items)} files to {branch}")
-                return True
+            
+            # 3. Create blobs for each file; they don't depend on the base
+            # tree, so they are created concurrently while it resolves
+            base_commit, *blob_responses = await asyncio.gather(
+                get_base_commit(),
+                *[create_blob(file_data["content"]) for file_data in files]
+            )
+            if not base_commit:
+                return False
+            current_commit_sha, base_tree_sha = base_commit
+            
+            tree_items = []
+            for file_data, blob_response in zip(files, blob_responses):
+                if blob_response.status_code != 201:
+                    logger.error(f"Failed to create blob for {file_data['path']}: {blob_response.text}")
+                    continue
                 
+                blob_sha = blob_response.json()["sha"]
+                tree_items.append({
+                    "path": file_data["path"],
+                    "mode": "100644",
+                    "type": "blob",
+                    "sha": blob_sha
+                })
+            
+            if not tree_items:
+                logger.error("No files were successfully processed")
+                return False
+            
+            # 4. Create a new tree
+            tree_response = await github_http.post(
+                f"/repos/{owner}/{repo}/git/trees",
+                headers=self.headers,
+                timeout=GITHUB_COMMIT_TIMEOUT,
+                json={
+                    "base_tree": base_tree_sha,
+                    "tree": tree_items
+                }
+            )
+            if tree_response.status_code != 201:
+                logger.error(f"Failed to create tree: {tree_response.text}")
+                return False
+            
+            new_tree_sha = tree_response.json()["sha"]
+            
+            # 5. Create a new commit
+            new_commit_response = await github_http.post(
+                f"/repos/{owner}/{repo}/git/commits",
+                headers=self.headers,
+                timeout=GITHUB_COMMIT_TIMEOUT,
+                json={
+                    "message": commit_message,
+                    "tree": new_tree_sha,
+                    "parents": [current_commit_sha]
+                }
+            )
+            if new_commit_response.status_code != 201:
+                logger.error(f"Failed to create commit: {new_commit_response.text}")
+                return False
+            
+            new_commit_sha = new_commit_response.json()["sha"]
+            
+            # 6. Update the branch reference
+            update_ref_response = await github_http.patch(
+                f"/repos/{owner}/{repo}/git/refs/heads/{branch}",
+                headers=self.headers,
+                timeout=GITHUB_COMMIT_TIMEOUT,
+                json={"sha": new_commit_sha}
+            )
+            if update_ref_response.status_code != 200:
+                logger.error(f"Failed to update ref: {update_ref_response.text}")
+                return False
+            
+            logger.info(f"Successfully committed {len(tree_items)} files to {branch}")
+            return True
+        
         except Exception as e:
             logger.error(f"Error committing files: {e}")
             return False
@@ -440,83 +964,105 @@ class GitHubService:
     async def create_pull_request(self, owner: str, repo: str, title: str, body: str,
                                    head: str, base: str) -> Optional[Dict]:
         """Create a pull request"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"https://api.github.com/repos/{owner}/{repo}/pulls",
-                headers=self.headers,
-                json={
-                    "title": title,
-                    "body": body,
-                    "head": head,
-                    "base": base
-                }
-            )
-            
-            if response.status_code == 201:
-                data = response.json()
-                logger.info(f"Created PR #{data['number']} in {owner}/{repo}")
-                return {
-                    "number": data["number"],
-                    "url": data["html_url"],
-                    "state": data["state"]
-                }
-            else:
-                logger.error(f"Failed to create PR: {response.status_code} - {response.text}")
-                return None
+        response = await github_http.post(
+            f"/repos/{owner}/{repo}/pulls",
+            headers=self.headers,
+            json={
+                "title": title,
+                "body": body,
+                "head": head,
+                "base": base
+            }
+        )
+        
+        if response.status_code == 201:
+            data = response.json()
+            logger.info(f"Created PR #{data['number']} in {owner}/{repo}")
+            return {
+                "number": data["number"],
+                "url": data["html_url"],
+                "state": data["state"]
+            }
+        else:
+            logger.error(f"Failed to create PR: {response.status_code} - {response.text}")
+            return None
     
     async def merge_pull_request(self, owner: str, repo: str, pr_number: int, 
                                   merge_method: str = "squash") -> bool:
         """Merge a pull request"""
-        async with httpx.AsyncClient() as client:
-            response = await client.put(
-                f"https://api.github.com/repos/{owner}/{repo}/pulls/{pr_number}/merge",
-                headers=self.headers,
-                json={"merge_method": merge_method}
-            )
-            return response.status_code in [200, 201, 202]
+        response = await github_http.put(
+            f"/repos/{owner}/{repo}/pulls/{pr_number}/merge",
+            headers=self.headers,
+            json={"merge_method": merge_method}
+        )
+        return response.status_code in [200, 201, 202]
     
     async def get_pr_files(self, owner: str, repo: str, pr_number: int) -> List[Dict]:
         """Get files changed in a PR"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://api.github.com/repos/{owner}/{repo}/pulls/{pr_number}/files",
-                headers=self.headers
-            )
-            if response.status_code == 200:
-                return response.json()
+        response = await github_http.get(
+            f"/repos/{owner}/{repo}/pulls/{pr_number}/files",
+            headers=self.headers
+        )
+        if response.status_code == 200:
+            return response.json()
         return []
 
 # ======================
 # CODE PARSER FUNCTIONS
 # ======================
 
-def parse_ai_code_response(response: str) -> List[Dict[str, str]]:
-    """Parse AI response to extract file changes with paths and content"""
-    files = []
-    
+# Opening-fence patterns for parse_ai_code_response, compiled once. Each
+# block body runs to the next ``` and is found by find_code_blocks.
+CODE_FILE_HEADERS = [
     # Pattern 1: ```filepath\n...code...\n```
-    pattern1 = r'```([a-zA-Z0-9_\-./]+(?:\.[a-zA-Z0-9]+)?)\n(.*?)```'
-    
+    re.compile(r'```([a-zA-Z0-9_\-./]+(?:\.[a-zA-Z0-9]+)?)\n', re.IGNORECASE),
     # Pattern 2: **filepath** or ### filepath followed by code block
-    pattern2 = r'(?:\*\*|###?\s*)([a-zA-Z0-9_\-./]+(?:\.[a-zA-Z0-9]+)?)(?:\*\*|:)?\s*\n```(?:[a-zA-Z]*)\n(.*?)```'
-    
+    re.compile(r'(?:\*\*|###?\s*)([a-zA-Z0-9_\-./]+(?:\.[a-zA-Z0-9]+)?)(?:\*\*|:)?\s*\n```(?:[a-zA-Z]*)\n', re.IGNORECASE),
     # Pattern 3: File: filepath or Path: filepath followed by code
-    pattern3 = r'(?:File|Path|Filename):\s*[`"]?([a-zA-Z0-9_\-./]+(?:\.[a-zA-Z0-9]+)?)[`"]?\s*\n```(?:[a-zA-Z]*)\n(.*?)```'
+    re.compile(r'(?:File|Path|Filename):\s*[`"]?([a-zA-Z0-9_\-./]+(?:\.[a-zA-Z0-9]+)?)[`"]?\s*\n```(?:[a-zA-Z]*)\n', re.IGNORECASE),
+]
+CODE_BLOCK_HEADER = re.compile(r'```(?:[a-zA-Z]*)\n')
+CODE_PATH_COMMENT_PATTERN = re.compile(r'^(?://|#|/\*|<!--)\s*(?:File|Path)?:?\s*([a-zA-Z0-9_\-./]+(?:\.[a-zA-Z0-9]+)?)')
+LANGUAGE_SPECIFIERS = frozenset({
+    'php', 'javascript', 'python', 'dart', 'vue', 'html', 'css', 'json', 'yaml', 'bash', 'shell', 'sql', 'xml'
+})
+
+def find_code_blocks(header: re.Pattern, text: str):
+    """Yield (header match, body) for each header followed by a closing fence.
+    
+    Matches exactly what header + (.*?)``` finds under DOTALL, but locates
+    the closing fence with str.find, so long bodies are scanned only once.
+    """
+    pos = 0
+    while True:
+        m = header.search(text, pos)
+        if not m:
+            return
+        end = text.find("```", m.end())
+        if end < 0:
+            # No later header can have a closing fence either
+            return
+        yield m, text[m.end():end]
+        pos = end + 3
+
+def parse_ai_code_response(response: str) -> List[Dict[str, str]]:
+    """Parse AI response to extract file changes with paths and content"""
+    files = []
+    seen = set()
     
     # Try all patterns
-    for pattern in [pattern1, pattern2, pattern3]:
-        matches = re.findall(pattern, response, re.DOTALL | re.IGNORECASE)
-        for match in matches:
-            filepath, content = match
+    for header in CODE_FILE_HEADERS:
+        for m, content in find_code_blocks(header, response):
+            filepath = m.group(1)
             # Skip if filepath looks like a language specifier
-            if filepath.lower() in ['php', 'javascript', 'python', 'dart', 'vue', 'html', 'css', 'json', 'yaml', 'bash', 'shell', 'sql', 'xml']:
+            if filepath.lower() in LANGUAGE_SPECIFIERS:
                 continue
             # Clean up the filepath
             filepath = filepath.strip().lstrip('/')
             if filepath and content.strip():
                 # Check if this file is already in the list
-                existing = next((f for f in files if f['path'] == filepath), None)
-                if not existing:
+                if filepath not in seen:
+                    seen.add(filepath)
                     files.append({
                         'path': filepath,
                         'content': content.strip(),
@@ -526,13 +1072,13 @@ def parse_ai_code_response(response: str) -> List[Dict[str, str]]:
     # If no files found, try to extract from more generic code blocks
     if not files:
         # Look for code blocks with file path comments at the start
-        code_blocks = re.findall(r'```(?:[a-zA-Z]*)\n(.*?)```', response, re.DOTALL)
-        for block in code_blocks:
+        for _, block in find_code_blocks(CODE_BLOCK_HEADER, response):
             # Check for file path in first line comment
-            first_line_match = re.match(r'^(?://|#|/\*|<!--)\s*(?:File|Path)?:?\s*([a-zA-Z0-9_\-./]+(?:\.[a-zA-Z0-9]+)?)', block.strip())
+            first_line_match = CODE_PATH_COMMENT_PATTERN.match(block.strip())
             if first_line_match:
                 filepath = first_line_match.group(1).strip()
-                if filepath and not filepath.lower() in ['php', 'javascript', 'python']:
+                if filepath and not filepath.lower() in ['php', 'javascript', 'python'] and filepath not in seen:
+                    seen.add(filepath)
                     files.append({
                         'path': filepath,
                         'content': block.strip(),
@@ -541,36 +1087,79 @@ def parse_ai_code_response(response: str) -> List[Dict[str, str]]:
     
     return files
 
+BRANCH_DISALLOWED_CHARS = re.compile(r'[^a-z0-9\s-]')
+# A run of whitespace and hyphens becomes a single hyphen
+BRANCH_SEPARATOR_RUNS = re.compile(r'[\s-]+')
+
 def generate_branch_name(task_title: str) -> str:
     """Generate a valid git branch name from task title"""
     # Convert to lowercase and replace spaces with hyphens
-    branch = task_title.lower()
-    branch = re.sub(r'[^a-z0-9\s-]', '', branch)
-    branch = re.sub(r'\s+', '-', branch)
-    branch = re.sub(r'-+', '-', branch)
+    branch = BRANCH_DISALLOWED_CHARS.sub('', task_title.lower())
+    branch = BRANCH_SEPARATOR_RUNS.sub('-', branch)
     branch = branch.strip('-')[:50]
     
     # Add prefix and timestamp for uniqueness
     timestamp = datetime.now().strftime('%Y%m%d%H%M')
     return f"feature/{branch}-{timestamp}"
 
+async def push_pull_request_to_github(
+    pr_id: str,
+    token: str,
+    owner: str,
+    repo: str,
+    default_branch: str,
+    branch_name: str,
+    task: dict,
+    files_changed: List[Dict[str, str]]
+):
+    """Create the branch, commit and GitHub PR behind a pending PR record"""
+    gh = GitHubService(token)
+    pr_result = None
+    
+    try:
+        # Create a new branch
+        if await gh.create_branch(owner, repo, branch_name, default_branch):
+            # Commit all files to the new branch
+            commit_success = await gh.commit_multiple_files(
+                owner, repo, branch_name,
+                files_changed,
+                f"feat: {task['title']}\n\nImplemented by DevAI"
+            )
+            
+            if commit_success:
+                pr_result = await gh.create_pull_request(
+                    owner, repo,
+                    title=f"feat: {task['title']}",
+                    body=f"## Task\n{task['title']}\n\n## Description\n{task.get('description', 'No description')}\n\n## Changes\nThis PR includes {len(files_changed)} file(s):\n" + 
+                         "\n".join([f"- `{f['path']}`" for f in files_changed]) +
+                         "\n\n---\n*Generated by DevAI*",
+                    head=branch_name,
+                    base=default_branch
+                )
+    except Exception as e:
+        logger.error(f"GitHub PR creation failed for {pr_id}: {e}")
+    
+    if pr_result:
+        update = {"status": "open", "github_pr_number": pr_result["number"], "github_pr_url": pr_result["url"]}
+    else:
+        update = {"status": "failed"}
+    update["updated_at"] = datetime.now(timezone.utc).isoformat()
+    await db.pull_requests.update_one({"id": pr_id}, {"$set": update})
+
 # ======================
 # AUTH ENDPOINTS
 # ======================
 
 @api_router.post("/auth/register", response_model=TokenResponse)
 async def register(data: UserRegister):
-    existing = await db.users.find_one({"email": data.email})
-    if existing:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    user_id = str(uuid.uuid4())
-    now = datetime.now(timezone.utc).isoformat()
+    user_id = secrets.token_hex(16)
+    now_dt = datetime.now(timezone.utc)
+    now = now_dt.isoformat()
     
     user_doc = {
         "id": user_id,
         "email": data.email,
-        "password": hash_password(data.password),
+        "password": await hash_password(data.password),
         "name": data.name,
         "avatar_url": None,
         "github_connected": False,
@@ -585,22 +1174,39 @@ async def register(data: UserRegister):
         "updated_at": now
     }
     
-    await db.users.insert_one(user_doc)
+    access_token = create_token(user_id, "access", now_dt)
+    refresh_jti = new_id()
+    refresh_token = create_token(user_id, "refresh", now_dt, refresh_jti)
     
-    access_token = create_token(user_id, "access")
-    refresh_token = create_token(user_id, "refresh")
-    
-    await db.refresh_tokens.insert_one({
+    refresh_doc = {
         "user_id": user_id,
-        "token": refresh_token,
+        "jti": refresh_jti,
         "created_at": now,
-        "expires_at": (datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRATION_DAYS)).isoformat()
-    })
+        # BSON date so the TTL index can expire it
+        "expires_at": now_dt + timedelta(days=REFRESH_TOKEN_EXPIRATION_DAYS)
+    }
+    
+    # Independent collections, so both inserts can share one round-trip; the
+    # unique email index rejects duplicates without a separate lookup first
+    # Both inserts are awaited before cleanup, so a refresh row can't land
+    # after the delete meant to remove it
+    user_result, refresh_result = await asyncio.gather(
+        db.users.insert_one(user_doc),
+        db.refresh_tokens.insert_one(refresh_doc),
+        return_exceptions=True
+    )
+    if isinstance(user_result, DuplicateKeyError):
+        if not isinstance(refresh_result, BaseException):
+            await db.refresh_tokens.delete_one({"user_id": user_id, "jti": refresh_jti})
+        raise HTTPException(status_code=400, detail="Email already registered")
+    for result in (user_result, refresh_result):
+        if isinstance(result, BaseException):
+            raise result
     
-    return TokenResponse(
+    return TokenResponse.model_construct(
         access_token=access_token,
         refresh_token=refresh_token,
-        user=UserResponse(
+        user=UserResponse.model_construct(
             id=user_id,
             email=data.email,
             name=data.name,
@@ -617,45 +1223,72 @@ async def login(data: UserLogin):
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    if not verify_password(data.password, user["password"]):
-        raise HTTPException(status_code=401, detail="Invalid credentials")
-    
-    access_token = create_token(user["id"], "access")
-    refresh_token = create_token(user["id"], "refresh")
-    
-    now = datetime.now(timezone.utc).isoformat()
-    await db.refresh_tokens.insert_one({
-        "user_id": user["id"],
-        "token": refresh_token,
-        "created_at": now,
-        "expires_at": (datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRATION_DAYS)).isoformat()
-    })
-    
-    return TokenResponse(
+    digest = hashlib.sha256(data.password.encode('utf-8') + user["id"].encode('utf-8')).digest()
+    cached = _login_cache.get(user["id"])
+    if not (cached and cached[1] == user["password"] and hmac.compare_digest(cached[0], digest)):
+        if not await verify_password(data.password, user["password"]):
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+        # Move hashes from older cost settings onto BCRYPT_ROUNDS while the
+        # plaintext is at hand, so later logins pay the current cost
+        if password_needs_rehash(user["password"]):
+            user["password"] = await hash_password(data.password)
+            await db.users.update_one({"id": user["id"]}, {"$set": {"password": user["password"]}})
+        _login_cache[user["id"]] = (digest, user["password"])
+    
+    now_dt = datetime.now(timezone.utc)
+    access_token = create_token(user["id"], "access", now_dt)
+    refresh_jti = new_id()
+    refresh_token = create_token(user["id"], "refresh", now_dt, refresh_jti)
+    
+    # Store the new token and prune this user's expired ones in one round-trip,
+    # without waiting for the TTL monitor
+    await db.refresh_tokens.bulk_write([
+        DeleteMany({"user_id": user["id"], "expires_at": {"$lt": now_dt}}),
+        InsertOne({
+            "user_id": user["id"],
+            "jti": refresh_jti,
+            "created_at": now_dt.isoformat(),
+            # BSON date so the TTL index can expire it
+            "expires_at": now_dt + timedelta(days=REFRESH_TOKEN_EXPIRATION_DAYS)
+        })
+    ], ordered=False)
+    
+    return TokenResponse.model_construct(
         access_token=access_token,
         refresh_token=refresh_token,
-        user=UserResponse(
+        user=UserResponse.model_construct(
             id=user["id"],
             email=user["email"],
             name=user["name"],
             avatar_url=user.get("avatar_url"),
             github_connected=user.get("github_connected", False),
             github_username=user.get("github_username"),
-            created_at=format_datetime(user["created_at"])
+            created_at=user["created_at"]
         )
     )
 
 @api_router.post("/auth/refresh", response_model=dict)
 async def refresh_token(data: RefreshTokenRequest):
     try:
-        payload = jwt.decode(data.refresh_token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = jwt.decode(data.refresh_token, _JWT_KEY, algorithms=[JWT_ALGORITHM])
         if payload.get("type") != "refresh":
             raise HTTPException(status_code=401, detail="Invalid token type")
         
         user_id = payload.get("sub")
-        stored = await db.refresh_tokens.find_one({"user_id": user_id, "token": data.refresh_token})
-        if not stored:
+        jti = payload.get("jti")
+        # Tokens issued before jti was added are still stored whole
+        token_filter = {"user_id": user_id, "jti": jti} if jti else {"user_id": user_id, "token": data.refresh_token}
+        # Validate the stored token and confirm its user still exists in one round-trip
+        matches = await db.refresh_tokens.aggregate([
+            {"$match": token_filter},
+            {"$limit": 1},
+            {"$lookup": {"from": "users", "localField": "user_id", "foreignField": "id", "as": "user"}},
+            {"$project": {"_id": 0, "user.id": 1}}
+        ]).to_list(1)
+        if not matches:
             raise HTTPException(status_code=401, detail="Token not found")
+        if not matches[0]["user"]:
+            raise HTTPException(status_code=401, detail="User not found")
         
         new_access_token = create_token(user_id, "access")
         return {"access_token": new_access_token, "token_type": "bearer"}
@@ -666,19 +1299,20 @@ async def refresh_token(data: RefreshTokenRequest):
 
 @api_router.get("/auth/me", response_model=UserResponse)
 async def get_me(current_user: dict = Depends(get_current_user)):
-    return UserResponse(
+    return UserResponse.model_construct(
         id=current_user["id"],
         email=current_user["email"],
         name=current_user["name"],
         avatar_url=current_user.get("avatar_url"),
         github_connected=current_user.get("github_connected", False),
         github_username=current_user.get("github_username"),
-        created_at=format_datetime(current_user["created_at"])
+        created_at=current_user["created_at"]
     )
 
 @api_router.post("/auth/logout")
 async def logout(current_user: dict = Depends(get_current_user)):
     await db.refresh_tokens.delete_many({"user_id": current_user["id"]})
+    invalidate_user_cache(current_user["id"])
     return {"message": "Logged out successfully"}
 
 # ======================
@@ -690,20 +1324,15 @@ async def get_github_auth_url(current_user: dict = Depends(get_current_user)):
     if not GITHUB_CLIENT_ID:
         raise HTTPException(status_code=400, detail="GitHub OAuth not configured. Please set GITHUB_CLIENT_ID in environment variables.")
     
-    state = str(uuid.uuid4())
-    await db.oauth_states.insert_one({
-        "state": state,
-        "user_id": current_user["id"],
-        "created_at": datetime.now(timezone.utc).isoformat()
+    # Signed, self-expiring state bound to the user; no server-side storage
+    state = encode_jwt({
+        "sub": current_user["id"],
+        "nonce": secrets.token_hex(8),
+        "exp": datetime.now(timezone.utc) + timedelta(seconds=OAUTH_STATE_TTL_SECONDS),
+        "type": "oauth_state"
     })
     
-    auth_url = (
-        f"https://github.com/login/oauth/authorize"
-        f"?client_id={GITHUB_CLIENT_ID}"
-        f"&redirect_uri={GITHUB_REDIRECT_URI}"
-        f"&scope=repo user"
-        f"&state={state}"
-    )
+    auth_url = GITHUB_AUTH_URL_PREFIX + state
     
     return {"auth_url": auth_url, "state": state}
 
@@ -713,57 +1342,68 @@ async def github_callback(
     state: str = Form(...),
     current_user: dict = Depends(get_current_user)
 ):
-    stored_state = await db.oauth_states.find_one({"state": state, "user_id": current_user["id"]})
-    if not stored_state:
+    try:
+        state_payload = jwt.decode(state, _JWT_KEY, algorithms=[JWT_ALGORITHM])
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=400, detail="Invalid state parameter")
+    if state_payload.get("type") != "oauth_state" or state_payload.get("sub") != current_user["id"]:
         raise HTTPException(status_code=400, detail="Invalid state parameter")
-    
-    await db.oauth_states.delete_one({"state": state})
     
     if not GITHUB_CLIENT_ID or not GITHUB_CLIENT_SECRET:
         raise HTTPException(status_code=400, detail="GitHub OAuth not configured")
     
-    async with httpx.AsyncClient() as client:
-        token_response = await client.post(
-            "https://github.com/login/oauth/access_token",
-            data={
-                "client_id": GITHUB_CLIENT_ID,
-                "client_secret": GITHUB_CLIENT_SECRET,
-                "code": code,
-                "redirect_uri": GITHUB_REDIRECT_URI
-            },
-            headers={"Accept": "application/json"}
-        )
-        
-        if token_response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to exchange code for token")
-        
-        token_data = token_response.json()
-        
-        if "error" in token_data:
-            raise HTTPException(status_code=400, detail=token_data.get("error_description", "GitHub OAuth error"))
-        
-        github_token = token_data.get("access_token")
-        
-        user_response = await client.get(
-            "https://api.github.com/user",
-            headers={"Authorization": f"Bearer {github_token}"}
-        )
-        
-        if user_response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to get GitHub user info")
-        
-        github_user = user_response.json()
+    token_response = await github_http.post(
+        "https://github.com/login/oauth/access_token",
+        data={
+            "client_id": GITHUB_CLIENT_ID,
+            "client_secret": GITHUB_CLIENT_SECRET,
+            "code": code,
+            "redirect_uri": GITHUB_REDIRECT_URI
+        },
+        headers={"Accept": "application/json"}
+    )
+    
+    if token_response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to exchange code for token")
+    
+    token_data = token_response.json()
+    
+    if "error" in token_data:
+        raise HTTPException(status_code=400, detail=token_data.get("error_description", "GitHub OAuth error"))
+    
+    github_token = token_data.get("access_token")
+    if not github_token:
+        raise HTTPException(status_code=400, detail="GitHub did not return an access token")
+    gh_headers = github_headers(github_token)
+    
+    # The repo list is almost always requested right after connecting, so
+    # fetch it alongside the profile and keep it warm for list_github_repos
+    try:
+        async with asyncio.timeout(GITHUB_FETCH_TIMEOUT_SECONDS), asyncio.TaskGroup() as tg:
+            user_task = tg.create_task(github_http.get("/user", headers=gh_headers))
+            repos_task = tg.create_task(fetch_github_repos(github_token))
+    except* (TimeoutError, httpx.TimeoutException):
+        raise HTTPException(status_code=504, detail="GitHub request timed out")
+    user_response, (_, repos) = user_task.result(), repos_task.result()
+    
+    if user_response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to get GitHub user info")
+    
+    github_user = user_response.json()
+    if repos is not None:
+        _github_repos_cache[current_user["id"]] = (repos, time.time())
     
     await db.users.update_one(
         {"id": current_user["id"]},
         {"$set": {
             "github_connected": True,
             "github_username": github_user["login"],
-            "github_access_token": github_token,
+            **github_token_fields(token_data),
             "avatar_url": github_user.get("avatar_url"),
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    invalidate_user_cache(current_user["id"])
     
     return {"message": "GitHub connected successfully", "github_username": github_user["login"]}
 
@@ -775,32 +1415,32 @@ async def disconnect_github(current_user: dict = Depends(get_current_user)):
             "github_connected": False,
             "github_username": None,
             "github_access_token": None,
+            "github_refresh_token": None,
+            "github_token_expires_at": None,
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    invalidate_user_cache(current_user["id"])
+    _github_repos_cache.pop(current_user["id"], None)
     return {"message": "GitHub disconnected successfully"}
 
 @api_router.get("/github/repos", response_model=List[GitHubRepoResponse])
-async def list_github_repos(current_user: dict = Depends(get_current_user)):
-    user = await db.users.find_one({"id": current_user["id"]}, {"_id": 0})
-    
-    if not user.get("github_connected") or not user.get("github_access_token"):
+async def list_github_repos(current_user: dict = Depends(get_github_user)):
+    if not current_user.get("github_connected") or not current_user.get("github_access_token"):
         raise HTTPException(status_code=400, detail="GitHub not connected")
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            "https://api.github.com/user/repos",
-            headers={"Authorization": f"Bearer {user['github_access_token']}"},
-            params={"sort": "updated", "per_page": 100, "type": "all"}
-        )
-        
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Failed to fetch repositories")
-        
-        repos = response.json()
+    cached = _github_repos_cache.get(current_user["id"])
+    if cached and time.time() - cached[1] < GITHUB_REPOS_FRESH_SECONDS:
+        repos = cached[0]
+    else:
+        status_code, repos = await fetch_github_repos(current_user['github_access_token'])
+        if repos is None:
+            raise HTTPException(status_code=status_code, detail="Failed to fetch repositories")
+        _github_repos_cache[current_user["id"]] = (repos, time.time())
     
+    # Payload comes straight from GitHub's schema, so skip re-validation
     return [
-        GitHubRepoResponse(
+        GitHubRepoResponse.model_construct(
             id=repo["id"],
             name=repo["name"],
             full_name=repo["full_name"],
@@ -819,29 +1459,23 @@ async def get_repo_contents(
     owner: str,
     repo: str,
     path: str = "",
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_github_user)
 ):
-    user = await db.users.find_one({"id": current_user["id"]}, {"_id": 0})
-    
-    if not user.get("github_connected") or not user.get("github_access_token"):
+    if not current_user.get("github_connected") or not current_user.get("github_access_token"):
         raise HTTPException(status_code=400, detail="GitHub not connected")
     
-    url = f"https://api.github.com/repos/{owner}/{repo}/contents"
+    # yarl percent-encodes each segment, so paths with spaces or '#' survive
+    url = URL("/repos") / owner / repo / "contents"
+    path = path.strip("/")
     if path:
-        url += f"/{path}"
+        url = url / path
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            url,
-            headers={"Authorization": f"Bearer {user['github_access_token']}"}
-        )
-        
-        if response.status_code == 404:
-            raise HTTPException(status_code=404, detail="Repository or path not found")
-        elif response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Failed to fetch contents")
-        
-        contents = response.json()
+    status_code, contents = await github_get_cached(str(url), current_user['github_access_token'])
+    
+    if status_code == 404:
+        raise HTTPException(status_code=404, detail="Repository or path not found")
+    elif status_code != 200:
+        raise HTTPException(status_code=status_code, detail="Failed to fetch contents")
     
     if isinstance(contents, dict):
         return {
@@ -865,31 +1499,78 @@ async def get_repo_contents(
 # PROJECT ENDPOINTS
 # ======================
 
+# Uploaded projects keep one project_files document per source file, keyed by
+# project_id and path. Files small enough to store carry their zstd-compressed
+# text under content_z; the rest only record path and size.
+PROJECT_RESPONSE_PROJECTION = {
+    "_id": 0, "id": 1, "name": 1, "description": 1, "tech_stack": 1, "source_type": 1,
+    "github_repo": 1, "github_owner": 1, "summary": 1, "file_count": 1, "status": 1,
+    "created_at": 1, "updated_at": 1
+}
+PROJECT_EXISTS_PROJECTION = {"_id": 0, "id": 1}
+
+# user_id -> set of owned project ids, for ownership checks on nested routes
+_project_ids_cache = TTLCache(maxsize=10000, ttl=30)
+_project_ids_loading: Dict[str, asyncio.Task] = {}
+
+async def get_user_project_ids(user_id: str) -> set:
+    """Owned project ids, cached; concurrent misses share one query"""
+    ids = _project_ids_cache.get(user_id)
+    if ids is not None:
+        return ids
+    
+    loading = _project_ids_loading.get(user_id)
+    if loading is None:
+        loading = asyncio.ensure_future(db.projects.distinct("id", {"user_id": user_id}))
+        _project_ids_loading[user_id] = loading
+        loading.add_done_callback(lambda _: _project_ids_loading.pop(user_id, None))
+    
+    ids = set(await asyncio.shield(loading))
+    _project_ids_cache[user_id] = ids
+    return ids
+
+async def ensure_project_owner(project_id: str, user_id: str):
+    """Ownership from the cached ids, for reads; a project deleted elsewhere may still pass for up to 30s"""
+    if project_id in await get_user_project_ids(user_id):
+        return
+    # Another worker may have created the project after this cache filled
+    _project_ids_cache.pop(user_id, None)
+    if project_id not in await get_user_project_ids(user_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+
+async def ensure_project_exists(project_id: str, user_id: str):
+    """Ownership checked against the database, for writes that must not outlive the project"""
+    if not await db.projects.find_one({"id": project_id, "user_id": user_id}, PROJECT_EXISTS_PROJECTION):
+        raise HTTPException(status_code=404, detail="Project not found")
+
+PROJECT_FILE_PROJECTION = {"_id": 0, "path": 1, "content": 1, "content_z": 1, "size": 1}
+PROJECT_FILE_HAS_CONTENT = {"$or": [{"content_z": {"$exists": True}}, {"content": {"$exists": True}}]}
+
 @api_router.get("/projects", response_model=List[ProjectResponse])
 async def list_projects(current_user: dict = Depends(get_current_user)):
-    projects = await db.projects.find({"user_id": current_user["id"]}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    
-    return [
-        ProjectResponse(
-            id=p["id"],
-            name=p["name"],
-            description=p.get("description", ""),
-            tech_stack=p.get("tech_stack", []),
-            source_type=p["source_type"],
-            github_repo=p.get("github_repo"),
-            github_owner=p.get("github_owner"),
-            summary=p.get("summary"),
-            file_count=p.get("file_count", 0),
-            status=p.get("status", "analyzing"),
-            created_at=format_datetime(p["created_at"]),
-            updated_at=format_datetime(p["updated_at"])
-        )
+    projects = await db.projects.find({"user_id": current_user["id"]}, PROJECT_RESPONSE_PROJECTION).sort("created_at", -1).to_list(100)
+    
+    return ORJSONResponse([
+        {
+            "id": p["id"],
+            "name": p["name"],
+            "description": p.get("description", ""),
+            "tech_stack": p.get("tech_stack", []),
+            "source_type": p["source_type"],
+            "github_repo": p.get("github_repo"),
+            "github_owner": p.get("github_owner"),
+            "summary": p.get("summary"),
+            "file_count": p.get("file_count", 0),
+            "status": p.get("status", "analyzing"),
+            "created_at": p["created_at"],
+            "updated_at": p["updated_at"]
+        }
         for p in projects
-    ]
+    ])
 
 @api_router.post("/projects", response_model=ProjectResponse)
 async def create_project(data: ProjectCreate, current_user: dict = Depends(get_current_user)):
-    project_id = str(uuid.uuid4())
+    project_id = new_id()
     now = datetime.now(timezone.utc).isoformat()
     
     project_doc = {
@@ -903,15 +1584,15 @@ async def create_project(data: ProjectCreate, current_user: dict = Depends(get_c
         "github_owner": None,
         "summary": None,
         "file_count": 0,
-        "files": [],
         "status": "created",
         "created_at": now,
         "updated_at": now
     }
     
     await db.projects.insert_one(project_doc)
+    _project_ids_cache.pop(current_user["id"], None)
     
-    return ProjectResponse(
+    return ProjectResponse.model_construct(
         id=project_id,
         name=data.name,
         description=data.description or "",
@@ -928,9 +1609,9 @@ async def create_project(data: ProjectCreate, current_user: dict = Depends(get_c
 async def create_project_from_github(
     owner: str = Form(...),
     repo: str = Form(...),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_github_user)
 ):
-    user = await db.users.find_one({"id": current_user["id"]}, {"_id": 0})
+    user = current_user
     
     if not user.get("github_connected") or not user.get("github_access_token"):
         raise HTTPException(status_code=400, detail="GitHub not connected")
@@ -939,22 +1620,19 @@ async def create_project_from_github(
         "user_id": current_user["id"],
         "github_repo": repo,
         "github_owner": owner
-    })
+    }, PROJECT_EXISTS_PROJECTION)
     if existing:
         raise HTTPException(status_code=400, detail="Project from this repository already exists")
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"https://api.github.com/repos/{owner}/{repo}",
-            headers={"Authorization": f"Bearer {user['github_access_token']}"}
-        )
-        
-        if response.status_code != 200:
+    # Projects are usually picked from the repo list, which already carries
+    # the metadata needed here
+    repo_info = cached_github_repo(current_user["id"], owner, repo)
+    if repo_info is None:
+        status_code, repo_info = await github_get_cached(f"/repos/{owner}/{repo}", user['github_access_token'])
+        if status_code != 200:
             raise HTTPException(status_code=404, detail="Repository not found")
-        
-        repo_info = response.json()
     
-    project_id = str(uuid.uuid4())
+    project_id = new_id()
     now = datetime.now(timezone.utc).isoformat()
     
     tech_stack = []
@@ -972,17 +1650,18 @@ async def create_project_from_github(
         "github_repo": repo,
         "github_owner": owner,
         "github_default_branch": repo_info.get("default_branch", "main"),
+        "github_private": repo_info.get("private", True),
         "summary": None,
         "file_count": 0,
-        "files": [],
         "status": "analyzing",
         "created_at": now,
         "updated_at": now
     }
     
     await db.projects.insert_one(project_doc)
+    _project_ids_cache.pop(current_user["id"], None)
     
-    return ProjectResponse(
+    return ProjectResponse.model_construct(
         id=project_id,
         name=repo_info["name"],
         description=repo_info.get("description") or "",
@@ -997,92 +1676,198 @@ async def create_project_from_github(
         updated_at=now
     )
 
-@api_router.post("/projects/upload", response_model=ProjectResponse)
-async def upload_project(
-    file: UploadFile = File(...),
-    name: str = Form(...),
-    description: str = Form(""),
-    current_user: dict = Depends(get_current_user)
-):
-    if not file.filename.endswith('.zip'):
-        raise HTTPException(status_code=400, detail="Only ZIP files are supported")
-    
-    project_id = str(uuid.uuid4())
-    now = datetime.now(timezone.utc).isoformat()
-    
-    content = await file.read()
-    files_data = []
-    file_list = []  # Just paths for large projects
+UPLOAD_SKIP_EXTENSIONS = frozenset({
+    '.png', '.jpg', '.jpeg', '.gif', '.ico', '.svg', '.woff', '.woff2',
+    '.ttf', '.eot', '.mp3', '.mp4', '.zip', '.tar', '.gz', '.pdf',
+    '.exe', '.dll', '.so', '.dylib', '.class', '.pyc', '.lock'
+})
+
+# Common dependency/build directories, matched against each path segment
+UPLOAD_SKIP_DIRS = frozenset({
+    'node_modules', 'vendor', '.git', '__pycache__', 'build', 'dist', '.idea', '.vscode', 'coverage'
+})
+
+EXTENSION_TECH_STACK = {
+    '.php': ('Laravel', 'PHP'),
+    '.vue': ('Vue.js',),
+    '.dart': ('Flutter', 'Dart'),
+    '.js': ('JavaScript',),
+    '.jsx': ('JavaScript',),
+    '.ts': ('TypeScript',),
+    '.tsx': ('TypeScript',),
+    '.py': ('Python',),
+}
+
+def source_file_extension(path: str) -> Optional[str]:
+    """Lowercased extension of an archive path worth keeping, or None for
+    hidden files, dependency/build directories and binary/media files"""
+    if path.startswith('.') or '/.' in path:
+        return None
+    if not UPLOAD_SKIP_DIRS.isdisjoint(path.split('/')):
+        return None
+    # Only the extension is lowercased, not the whole path
+    _, dot, ext = path.rpartition('.')
+    if not dot or '/' in ext:
+        return ''
+    ext = '.' + ext.lower()
+    return None if ext in UPLOAD_SKIP_EXTENSIONS else ext
+
+def scan_zip_upload(fileobj) -> Tuple[List[dict], set]:
+    """Walk an uploaded ZIP: list its source files, keep small files' content
+    and detect the tech stack. Blocking; run it off the event loop.
+    
+    Every source file gets an entry; only those within the storage limits
+    carry content_z.
+    """
+    files = []
+    candidates = []  # (ZipInfo, entry) for files small enough to store
     tech_stack = set()
     total_content_size = 0
     MAX_TOTAL_SIZE = 10 * 1024 * 1024  # 10MB limit for stored content
     MAX_FILE_SIZE = 50000  # 50KB per file
     MAX_FILES_WITH_CONTENT = 100  # Max files to store content for
     
-    # Skip patterns for common non-essential directories
-    skip_dirs = ['node_modules', 'vendor', '.git', '__pycache__', 'build', 'dist', '.idea', '.vscode', 'coverage']
+    fileobj.seek(0)
+    with zipfile.ZipFile(fileobj) as zf:
+        for file_info in zf.filelist:
+            if file_info.is_dir():
+                continue
+            
+            filename = file_info.filename
+            ext = source_file_extension(filename)
+            if ext is None:
+                continue
+            lower_name = filename.lower()
+            
+            entry = {"path": filename, "size": file_info.file_size}
+            files.append(entry)
+            
+            # Detect tech stack
+            tech_stack.update(EXTENSION_TECH_STACK.get(ext, ()))
+            if 'laravel' in lower_name:
+                tech_stack.update(('Laravel', 'PHP'))
+            if 'flutter' in lower_name:
+                tech_stack.update(('Flutter', 'Dart'))
+            
+            # Store content only for small files within limits
+            if file_info.file_size < MAX_FILE_SIZE and len(candidates) < MAX_FILES_WITH_CONTENT:
+                candidates.append((file_info, entry))
+        
+        def read_member(file_info: zipfile.ZipInfo) -> Optional[Tuple[bytes, int]]:
+            try:
+                text = zf.read(file_info).decode('utf-8', errors='ignore')[:MAX_FILE_SIZE]
+            except Exception:
+                return None
+            return compress_file_content(text), len(text)
+        
+        # zlib and zstd release the GIL, so members decompress in parallel;
+        # ZipFile serializes the underlying file reads itself
+        with ThreadPoolExecutor(max_workers=ZIP_READ_WORKERS) as pool:
+            for (_, entry), result in zip(candidates, pool.map(read_member, [c[0] for c in candidates])):
+                if result is None or total_content_size >= MAX_TOTAL_SIZE:
+                    continue
+                entry["content_z"], size = result
+                total_content_size += size
+    
+    return files, tech_stack
+
+def scan_zip_path(path: str) -> Tuple[List[dict], set]:
+    with open(path, 'rb') as f:
+        return scan_zip_upload(f)
+
+def sample_tarball_sources(fileobj, limit: int, max_chars: int) -> List[Tuple[str, str]]:
+    """The first `limit` source files of a GitHub tarball as (path, text), each
+    cut to max_chars. Blocking; run it off the event loop."""
+    samples = []
+    fileobj.seek(0)
+    with tarfile.open(fileobj=fileobj, mode="r:gz") as tar:
+        for member in tar:
+            # Members sit under a single "<owner>-<repo>-<sha>/" directory
+            path = member.name.partition('/')[2]
+            if not member.isfile() or not path or source_file_extension(path) is None:
+                continue
+            # UTF-8 needs at most 4 bytes per character
+            text = tar.extractfile(member).read(max_chars * 4).decode('utf-8', errors='ignore')
+            samples.append((path, text[:max_chars]))
+            if len(samples) >= limit:
+                break
+    return samples
+
+async def sample_github_repo_sources(
+    owner: str, repo: str, token: str, limit: int, max_chars: int
+) -> List[Tuple[str, str]]:
+    """Source files from one tarball download of a repo's default branch.
+    
+    Returns an empty list if the download fails or exceeds
+    GITHUB_TARBALL_MAX_BYTES, so callers can fall back to a directory listing.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024) as spool:
+        try:
+            received = 0
+            async with github_http.stream(
+                "GET", f"/repos/{owner}/{repo}/tarball",
+                headers=github_headers(token), follow_redirects=True, timeout=GITHUB_COMMIT_TIMEOUT
+            ) as response:
+                if response.status_code != 200:
+                    return []
+                async for chunk in response.aiter_bytes(1 << 16):
+                    received += len(chunk)
+                    if received > GITHUB_TARBALL_MAX_BYTES:
+                        return []
+                    spool.write(chunk)
+            return await asyncio.to_thread(sample_tarball_sources, spool, limit, max_chars)
+        except (httpx.HTTPError, tarfile.TarError) as e:
+            logger.warning(f"Could not sample {owner}/{repo} from its tarball: {e}")
+            return []
+
+async def scan_large_zip_upload(fileobj) -> Tuple[List[dict], set]:
+    """Scan a large upload in the process pool, via a temp file the worker can open."""
+    def copy_to_disk() -> str:
+        fileobj.seek(0)
+        with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as tmp:
+            shutil.copyfileobj(fileobj, tmp, 1 << 20)
+            return tmp.name
+    
+    path = await asyncio.to_thread(copy_to_disk)
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(zip_scan_pool, scan_zip_path, path)
+    finally:
+        os.unlink(path)
+
+@api_router.post("/projects/upload", response_model=ProjectResponse)
+async def upload_project(
+    file: UploadFile = File(...),
+    name: str = Form(...),
+    description: str = Form(""),
+    current_user: dict = Depends(get_current_user)
+):
+    if not file.filename.endswith('.zip'):
+        raise HTTPException(status_code=400, detail="Only ZIP files are supported")
+    # The middleware caps the whole request body; this catches the file part
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Upload too large")
+    # Local file header, or end-of-directory record for an empty archive
+    signature = await file.read(4)
+    await file.seek(0)
+    if signature not in (b"PK\x03\x04", b"PK\x05\x06"):
+        raise HTTPException(status_code=400, detail="Invalid ZIP file")
+    
+    project_id = new_id()
+    now = datetime.now(timezone.utc).isoformat()
     
+    # Starlette already spools the upload to a temp file; ZipFile only needs
+    # to seek around it, so the archive never has to sit in memory at once
     try:
-        with zipfile.ZipFile(io.BytesIO(content)) as zf:
-            for file_info in zf.filelist:
-                if file_info.is_dir():
-                    continue
-                
-                filename = file_info.filename
-                
-                # Skip hidden files
-                if any(part.startswith('.') for part in filename.split('/')):
-                    continue
-                
-                # Skip common dependency/build directories
-                if any(skip_dir in filename.split('/') for skip_dir in skip_dirs):
-                    continue
-                
-                # Skip binary/media files
-                skip_extensions = ['.png', '.jpg', '.jpeg', '.gif', '.ico', '.svg', '.woff', '.woff2', 
-                                  '.ttf', '.eot', '.mp3', '.mp4', '.zip', '.tar', '.gz', '.pdf', 
-                                  '.exe', '.dll', '.so', '.dylib', '.class', '.pyc', '.lock']
-                if any(filename.lower().endswith(ext) for ext in skip_extensions):
-                    continue
-                
-                # Add to file list (for reference)
-                file_list.append({"path": filename, "size": file_info.file_size})
-                
-                # Detect tech stack
-                if filename.endswith('.php') or 'laravel' in filename.lower():
-                    tech_stack.add('Laravel')
-                    tech_stack.add('PHP')
-                if filename.endswith('.vue'):
-                    tech_stack.add('Vue.js')
-                if filename.endswith('.dart') or 'flutter' in filename.lower():
-                    tech_stack.add('Flutter')
-                    tech_stack.add('Dart')
-                if filename.endswith('.js') or filename.endswith('.jsx'):
-                    tech_stack.add('JavaScript')
-                if filename.endswith('.ts') or filename.endswith('.tsx'):
-                    tech_stack.add('TypeScript')
-                if filename.endswith('.py'):
-                    tech_stack.add('Python')
-                
-                # Store content only for small files within limits
-                if (file_info.file_size < MAX_FILE_SIZE and 
-                    total_content_size < MAX_TOTAL_SIZE and 
-                    len(files_data) < MAX_FILES_WITH_CONTENT):
-                    try:
-                        file_content = zf.read(filename).decode('utf-8', errors='ignore')
-                        truncated_content = file_content[:MAX_FILE_SIZE]
-                        files_data.append({
-                            "path": filename,
-                            "content": truncated_content,
-                            "size": file_info.file_size
-                        })
-                        total_content_size += len(truncated_content)
-                    except Exception:
-                        pass
+        if file.size is not None and file.size > ZIP_PROCESS_SCAN_THRESHOLD:
+            files, tech_stack = await scan_large_zip_upload(file.file)
+        else:
+            files, tech_stack = await asyncio.to_thread(scan_zip_upload, file.file)
     except zipfile.BadZipFile:
         raise HTTPException(status_code=400, detail="Invalid ZIP file")
     
-    logger.info(f"Uploaded project: {len(file_list)} files found, {len(files_data)} with content stored")
+    stored_count = sum(1 for f in files if "content_z" in f)
+    logger.info(f"Uploaded project: {len(files)} files found, {stored_count} with content stored")
     
     project_doc = {
         "id": project_id,
@@ -1094,24 +1879,30 @@ async def upload_project(
         "github_repo": None,
         "github_owner": None,
         "summary": None,
-        "file_count": len(file_list),
-        "files": files_data,
-        "file_list": file_list,  # Full list of file paths
+        "file_count": len(files),
         "status": "analyzing",
         "created_at": now,
         "updated_at": now
     }
     
-    await db.projects.insert_one(project_doc)
-    
-    return ProjectResponse(
+    # The project and its files are independent documents, so both writes
+    # share one round-trip
+    writes = [db.projects.insert_one(project_doc)]
+    if files:
+        writes.append(db.project_files.insert_many(
+            [{"project_id": project_id, **f} for f in files], ordered=False
+        ))
+    await asyncio.gather(*writes)
+    _project_ids_cache.pop(current_user["id"], None)
+    
+    return ProjectResponse.model_construct(
         id=project_id,
         name=name,
         description=description,
         tech_stack=list(tech_stack),
         source_type="upload",
         summary=None,
-        file_count=len(files_data),
+        file_count=stored_count,
         status="analyzing",
         created_at=now,
         updated_at=now
@@ -1119,12 +1910,12 @@ async def upload_project(
 
 @api_router.get("/projects/{project_id}", response_model=ProjectResponse)
 async def get_project(project_id: str, current_user: dict = Depends(get_current_user)):
-    project = await db.projects.find_one({"id": project_id, "user_id": current_user["id"]}, {"_id": 0})
+    project = await db.projects.find_one({"id": project_id, "user_id": current_user["id"]}, PROJECT_RESPONSE_PROJECTION)
     
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    return ProjectResponse(
+    return ProjectResponse.model_construct(
         id=project["id"],
         name=project["name"],
         description=project.get("description", ""),
@@ -1135,41 +1926,49 @@ async def get_project(project_id: str, current_user: dict = Depends(get_current_
         summary=project.get("summary"),
         file_count=project.get("file_count", 0),
         status=project.get("status", "analyzing"),
-        created_at=format_datetime(project["created_at"]),
-        updated_at=format_datetime(project["updated_at"])
+        created_at=project["created_at"],
+        updated_at=project["updated_at"]
     )
 
 @api_router.get("/projects/{project_id}/files")
 async def get_project_files(project_id: str, current_user: dict = Depends(get_current_user)):
     """Get all files in a project with content"""
-    project = await db.projects.find_one({"id": project_id, "user_id": current_user["id"]}, {"_id": 0})
+    project = await db.projects.find_one(
+        {"id": project_id, "user_id": current_user["id"]},
+        {"_id": 0, "source_type": 1, "github_owner": 1, "github_repo": 1}
+    )
     
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    files = project.get("files", [])
-    file_list = project.get("file_list", [])
+    files = await db.project_files.find({"project_id": project_id}, PROJECT_FILE_PROJECTION).to_list(None)
     
     # Build a tree structure
     return {
-        "files": [{"path": f["path"], "content": f.get("content", ""), "size": f.get("size", 0)} for f in files],
-        "file_list": file_list,  # All file paths (may not have content for large projects)
+        "files": [
+            {"path": f["path"], "content": file_content(f), "size": f.get("size", 0)}
+            for f in files if "content_z" in f or "content" in f
+        ],
+        "file_list": [{"path": f["path"], "size": f.get("size", 0)} for f in files],  # All file paths (may not have content for large projects)
         "source_type": project.get("source_type"),
         "github_owner": project.get("github_owner"),
         "github_repo": project.get("github_repo")
     }
 
 @api_router.get("/projects/{project_id}/files/{file_path:path}")
-async def get_project_file(project_id: str, file_path: str, current_user: dict = Depends(get_current_user)):
+async def get_project_file(project_id: str, file_path: str, current_user: dict = Depends(get_github_user)):
     """Get a specific file content"""
-    project = await db.projects.find_one({"id": project_id, "user_id": current_user["id"]}, {"_id": 0})
+    project = await db.projects.find_one(
+        {"id": project_id, "user_id": current_user["id"]},
+        {"_id": 0, "source_type": 1, "github_owner": 1, "github_repo": 1, "github_default_branch": 1}
+    )
     
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
     # For GitHub projects, fetch from GitHub API
     if project.get("source_type") == "github":
-        user = await db.users.find_one({"id": current_user["id"]}, {"_id": 0})
+        user = current_user
         if user.get("github_access_token"):
             gh = GitHubService(user["github_access_token"])
             file_data = await gh.get_file_content(
@@ -1183,56 +1982,96 @@ async def get_project_file(project_id: str, file_path: str, current_user: dict =
         raise HTTPException(status_code=404, detail="File not found or GitHub not connected")
     
     # For uploaded projects, look in stored files
-    files = project.get("files", [])
-    for f in files:
-        if f["path"] == file_path:
-            return {"path": file_path, "content": f.get("content", ""), "source": "local"}
+    f = await db.project_files.find_one(
+        {"project_id": project_id, "path": file_path, **PROJECT_FILE_HAS_CONTENT}, PROJECT_FILE_PROJECTION
+    )
+    if f:
+        return {"path": file_path, "content": file_content(f), "source": "local"}
     
     raise HTTPException(status_code=404, detail="File not found")
 
-@api_router.delete("/projects/{project_id}")
+@api_router.delete("/projects/{project_id}", status_code=204)
 async def delete_project(project_id: str, current_user: dict = Depends(get_current_user)):
-    result = await db.projects.delete_one({"id": project_id, "user_id": current_user["id"]})
+    # Ownership comes from the cached project ids, so the project and its
+    # children can all be deleted in one round-trip
+    await ensure_project_owner(project_id, current_user["id"])
+    result, *_ = await asyncio.gather(
+        db.projects.delete_one({"id": project_id, "user_id": current_user["id"]}),
+        db.tasks.delete_many({"project_id": project_id}),
+        db.pull_requests.delete_many({"project_id": project_id}),
+        db.project_files.delete_many({"project_id": project_id})
+    )
+    _project_ids_cache.pop(current_user["id"], None)
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    await db.tasks.delete_many({"project_id": project_id})
-    await db.pull_requests.delete_many({"project_id": project_id})
-    
-    return {"message": "Project deleted successfully"}
+    return Response(status_code=204)
 
-@api_router.post("/projects/{project_id}/analyze")
-async def analyze_project(project_id: str, current_user: dict = Depends(get_current_user)):
-    """Analyze project with AI and generate summary"""
-    project = await db.projects.find_one({"id": project_id, "user_id": current_user["id"]}, {"_id": 0})
-    
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    user = await db.users.find_one({"id": current_user["id"]}, {"_id": 0})
-    settings = user.get("settings", {})
-    ai_provider = settings.get("ai_provider", "openai")
-    ai_model = settings.get("ai_model", "gpt-5.2")
-    
+def count_tokens(text: str) -> int:
+    """Token count of a prompt section, or ~4 characters per token when
+    tiktoken's encoding data cannot be loaded (it is fetched on first use)"""
+    global _token_encoding
+    if _token_encoding is None:
+        try:
+            _token_encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logger.warning(f"Falling back to estimated token counts: {e}")
+            _token_encoding = False
+    if _token_encoding is False:
+        return len(text) // 4
+    return len(_token_encoding.encode(text, disallowed_special=()))
+
+def fit_to_token_budget(sections: List[str], budget: int) -> str:
+    """Join sections in order for as long as they fit within `budget` tokens"""
+    kept = []
+    for section in sections:
+        budget -= count_tokens(section)
+        if budget < 0:
+            break
+        kept.append(section)
+    return "".join(kept)
+
+async def run_project_analysis(
+    project_id: str,
+    project: dict,
+    ai_provider: str,
+    ai_model: str,
+    github_token: Optional[str]
+):
+    """Generate a project's AI summary and record it, or mark the project errored"""
     files_content = ""
     
-    if project["source_type"] == "github" and user.get("github_access_token"):
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://api.github.com/repos/{project['github_owner']}/{project['github_repo']}/contents",
-                headers={"Authorization": f"Bearer {user['github_access_token']}"}
-            )
-            if response.status_code == 200:
-                contents = response.json()
-                file_list = [item["name"] for item in contents if item["type"] == "file"]
-                files_content = f"Repository files: {', '.join(file_list[:50])}"
-    elif project.get("files"):
-        for f in project["files"][:20]:
-            files_content += f"\n--- {f['path']} ---\n{f['content'][:2000]}\n"
-    
     try:
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
+        if project["source_type"] == "github" and github_token:
+            # Projects imported before github_private was recorded count as private
+            github_token = github_read_token(github_token, project.get("github_private") is False)
+            samples = await sample_github_repo_sources(
+                project["github_owner"], project["github_repo"], github_token, 20, 2000
+            )
+            if samples:
+                files_content = await asyncio.to_thread(
+                    fit_to_token_budget,
+                    [f"\n--- {path} ---\n{text}\n" for path, text in samples],
+                    ANALYSIS_TOKEN_BUDGET
+                )
+            else:
+                status_code, contents = await github_get_cached(
+                    f"/repos/{project['github_owner']}/{project['github_repo']}/contents",
+                    github_token
+                )
+                if status_code == 200:
+                    file_list = [item["name"] for item in contents if item["type"] == "file"]
+                    files_content = f"Repository files: {', '.join(file_list[:50])}"
+        elif project["source_type"] != "github":
+            files = await db.project_files.find(
+                {"project_id": project_id, **PROJECT_FILE_HAS_CONTENT}, PROJECT_FILE_PROJECTION
+            ).limit(20).to_list(20)
+            files_content = await asyncio.to_thread(
+                fit_to_token_budget,
+                [f"\n--- {f['path']} ---\n{file_content(f)[:2000]}\n" for f in files],
+                ANALYSIS_TOKEN_BUDGET
+            )
         
         chat = LlmChat(
             api_key=EMERGENT_LLM_KEY,
@@ -1256,14 +2095,13 @@ Description: {project.get('description', 'No description')}
 Provide a comprehensive analysis."""
         
         user_message = UserMessage(text=prompt)
-        summary = await chat.send_message(user_message)
+        async with llm_semaphore:
+            summary = await chat.send_message(user_message)
         
         await db.projects.update_one(
             {"id": project_id},
             {"$set": {"summary": summary, "status": "ready", "updated_at": datetime.now(timezone.utc).isoformat()}}
         )
-        
-        return {"summary": summary, "status": "ready"}
     
     except Exception as e:
         logger.error(f"AI analysis failed: {e}")
@@ -1271,44 +2109,133 @@ Provide a comprehensive analysis."""
             {"id": project_id},
             {"$set": {"status": "error", "updated_at": datetime.now(timezone.utc).isoformat()}}
         )
-        raise HTTPException(status_code=500, detail=f"AI analysis failed: {str(e)}")
+
+@api_router.post("/projects/{project_id}/analyze", status_code=202)
+async def analyze_project(
+    project_id: str,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_github_user)
+):
+    """Start AI analysis of a project; poll /analyze/status for the summary"""
+    project = await db.projects.find_one(
+        {"id": project_id, "user_id": current_user["id"]},
+        {"_id": 0, "name": 1, "description": 1, "tech_stack": 1, "source_type": 1,
+         "github_owner": 1, "github_repo": 1, "github_private": 1}
+    )
+    
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    settings = current_user.get("settings", {})
+    await db.projects.update_one(
+        {"id": project_id},
+        {"$set": {"status": "analyzing", "updated_at": datetime.now(timezone.utc).isoformat()}}
+    )
+    background_tasks.add_task(
+        run_project_analysis,
+        project_id, project,
+        settings.get("ai_provider", "openai"), settings.get("ai_model", "gpt-5.2"),
+        current_user.get("github_access_token")
+    )
+    return {"status": "analyzing"}
+
+@api_router.get("/projects/{project_id}/analyze/status")
+async def get_analysis_status(project_id: str, current_user: dict = Depends(get_current_user)):
+    project = await db.projects.find_one(
+        {"id": project_id, "user_id": current_user["id"]},
+        {"_id": 0, "status": 1, "summary": 1}
+    )
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return {"status": project.get("status"), "summary": project.get("summary")}
 
 # ======================
 # TASK ENDPOINTS
 # ======================
 
-@api_router.get("/projects/{project_id}/tasks", response_model=List[TaskResponse])
+# Static part of the task-execution system prompt, filled per call with format()
+TASK_SYSTEM_PROMPT = """You are an expert {tech_stack} developer and AI Software Engineer.
+You are working on the project: {name}
+Project description: {description}
+Project summary: {summary}
+
+Your task is to implement the requested feature or fix by generating ACTUAL CODE FILES.
+
+CRITICAL: You MUST output code in this EXACT format for each file:
+
+```path/to/filename.ext
+[complete file content here]
+```
+
+For example:
+```app/Http/Controllers/UserController.php
+<?php
+
+namespace App\\Http\\Controllers;
+
+class UserController extends Controller
+{{
+    public function index()
+    {{
+        return view('users.index');
+    }}
+}}
+```
+
+```resources/views/users/index.blade.php
+@extends('layouts.app')
+
+@section('content')
+<div class="container">
+    <h1>Users</h1>
+</div>
+@endsection
+```
+
+Rules:
+1. ALWAYS use the format ```filepath.ext followed by complete code
+2. Include ALL necessary files to make the feature work
+3. Create any missing directories/folders by including the full path
+4. For Laravel: include controllers, models, migrations, views, routes as needed
+5. For Vue.js: include components, views, store modules, routes as needed  
+6. For Flutter: include screens, widgets, models, services as needed
+7. Make the code production-ready and complete
+8. Include proper imports and dependencies"""
+
+# The task and PR lists only show file paths; the AI response and generated
+# file contents come from the single-item endpoints when a row is expanded
+TASK_LIST_PROJECTION = {"_id": 0, "ai_response": 0, "files_changed.content": 0}
+PR_LIST_PROJECTION = {"_id": 0, "files_changed.content": 0}
+
+@api_router.get("/projects/{project_id}/tasks", response_model=List[TaskListItem])
 async def list_tasks(project_id: str, current_user: dict = Depends(get_current_user)):
-    project = await db.projects.find_one({"id": project_id, "user_id": current_user["id"]}, {"_id": 0})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    tasks = await db.tasks.find({"project_id": project_id}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    
-    return [
-        TaskResponse(
-            id=t["id"],
-            project_id=t["project_id"],
-            title=t["title"],
-            description=t.get("description", ""),
-            status=t["status"],
-            priority=t.get("priority", "medium"),
-            ai_response=t.get("ai_response"),
-            pr_id=t.get("pr_id"),
-            files_changed=t.get("files_changed", []),
-            created_at=format_datetime(t["created_at"]),
-            updated_at=format_datetime(t["updated_at"])
-        )
+    await ensure_project_owner(project_id, current_user["id"])
+    
+    tasks = await db.tasks.find({"project_id": project_id}, TASK_LIST_PROJECTION).sort("created_at", -1).to_list(100)
+    
+    # Returned as a response directly, so FastAPI skips re-validating every
+    # row against response_model (kept for the OpenAPI schema)
+    return ORJSONResponse([
+        {
+            "id": t["id"],
+            "project_id": t["project_id"],
+            "title": t["title"],
+            "description": t.get("description", ""),
+            "status": t["status"],
+            "priority": t.get("priority", "medium"),
+            "pr_id": t.get("pr_id"),
+            "files_changed": t.get("files_changed", []),
+            "created_at": t["created_at"],
+            "updated_at": t["updated_at"]
+        }
         for t in tasks
-    ]
+    ])
 
 @api_router.post("/projects/{project_id}/tasks", response_model=TaskResponse)
 async def create_task(project_id: str, data: TaskCreate, current_user: dict = Depends(get_current_user)):
-    project = await db.projects.find_one({"id": project_id, "user_id": current_user["id"]}, {"_id": 0})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    await ensure_project_exists(project_id, current_user["id"])
     
-    task_id = str(uuid.uuid4())
+    task_id = new_id()
     now = datetime.now(timezone.utc).isoformat()
     
     task_doc = {
@@ -1328,7 +2255,7 @@ async def create_task(project_id: str, data: TaskCreate, current_user: dict = De
     
     await db.tasks.insert_one(task_doc)
     
-    return TaskResponse(
+    return TaskResponse.model_construct(
         id=task_id,
         project_id=project_id,
         title=data.title,
@@ -1342,12 +2269,30 @@ async def create_task(project_id: str, data: TaskCreate, current_user: dict = De
         updated_at=now
     )
 
-@api_router.put("/projects/{project_id}/tasks/{task_id}", response_model=TaskResponse)
-async def update_task(project_id: str, task_id: str, data: TaskUpdate, current_user: dict = Depends(get_current_user)):
-    task = await db.tasks.find_one({"id": task_id, "project_id": project_id}, {"_id": 0})
+@api_router.get("/projects/{project_id}/tasks/{task_id}", response_model=TaskResponse)
+async def get_task(project_id: str, task_id: str, current_user: dict = Depends(get_current_user)):
+    task = await db.tasks.find_one(
+        {"id": task_id, "project_id": project_id, "user_id": current_user["id"]}, {"_id": 0}
+    )
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
+    return TaskResponse.model_construct(
+        id=task["id"],
+        project_id=task["project_id"],
+        title=task["title"],
+        description=task.get("description", ""),
+        status=task["status"],
+        priority=task.get("priority", "medium"),
+        ai_response=task.get("ai_response"),
+        pr_id=task.get("pr_id"),
+        files_changed=task.get("files_changed", []),
+        created_at=task["created_at"],
+        updated_at=task["updated_at"]
+    )
+
+@api_router.put("/projects/{project_id}/tasks/{task_id}", response_model=TaskResponse)
+async def update_task(project_id: str, task_id: str, data: TaskUpdate, current_user: dict = Depends(get_current_user)):
     update_data = {"updated_at": datetime.now(timezone.utc).isoformat()}
     if data.title is not None:
         update_data["title"] = data.title
@@ -1358,10 +2303,18 @@ async def update_task(project_id: str, task_id: str, data: TaskUpdate, current_u
     if data.priority is not None:
         update_data["priority"] = data.priority
     
-    await db.tasks.update_one({"id": task_id}, {"$set": update_data})
-    updated_task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
+    # Tasks carry their owner's user_id, so one query both checks ownership
+    # and applies the update
+    updated_task = await db.tasks.find_one_and_update(
+        {"id": task_id, "project_id": project_id, "user_id": current_user["id"]},
+        {"$set": update_data},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated_task:
+        raise HTTPException(status_code=404, detail="Task not found")
     
-    return TaskResponse(
+    return TaskResponse.model_construct(
         id=updated_task["id"],
         project_id=updated_task["project_id"],
         title=updated_task["title"],
@@ -1371,116 +2324,86 @@ async def update_task(project_id: str, task_id: str, data: TaskUpdate, current_u
         ai_response=updated_task.get("ai_response"),
         pr_id=updated_task.get("pr_id"),
         files_changed=updated_task.get("files_changed", []),
-        created_at=format_datetime(updated_task["created_at"]),
-        updated_at=format_datetime(updated_task["updated_at"])
+        created_at=updated_task["created_at"],
+        updated_at=updated_task["updated_at"]
     )
 
-@api_router.delete("/projects/{project_id}/tasks/{task_id}")
+@api_router.delete("/projects/{project_id}/tasks/{task_id}", status_code=204)
 async def delete_task(project_id: str, task_id: str, current_user: dict = Depends(get_current_user)):
-    result = await db.tasks.delete_one({"id": task_id, "project_id": project_id})
+    result = await db.tasks.delete_one({"id": task_id, "project_id": project_id, "user_id": current_user["id"]})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Task not found")
-    return {"message": "Task deleted successfully"}
+    return Response(status_code=204)
+
+async def github_repo_root_names(project: dict, user: dict) -> Optional[List[str]]:
+    """Names at the root of a GitHub project's repository, or None if unavailable"""
+    if project["source_type"] != "github" or not user.get("github_access_token"):
+        return None
+    try:
+        status_code, contents = await github_get_cached(
+            f"/repos/{project['github_owner']}/{project['github_repo']}/contents",
+            github_read_token(user["github_access_token"], project.get("github_private") is False)
+        )
+    except Exception as e:
+        logger.warning(f"Could not fetch GitHub context: {e}")
+        return None
+    return [item["name"] for item in contents] if status_code == 200 else None
 
 @api_router.post("/projects/{project_id}/tasks/{task_id}/execute")
-async def execute_task(project_id: str, task_id: str, current_user: dict = Depends(get_current_user)):
+async def execute_task(
+    project_id: str,
+    task_id: str,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_github_user)
+):
     """Execute task with AI developer - generates code, creates branch, commits, and creates PR"""
-    task = await db.tasks.find_one({"id": task_id, "project_id": project_id}, {"_id": 0})
+    task, project = await asyncio.gather(
+        db.tasks.find_one({"id": task_id, "project_id": project_id, "user_id": current_user["id"]}, {"_id": 0}),
+        db.projects.find_one({"id": project_id, "user_id": current_user["id"]}, {"_id": 0})
+    )
+    user = current_user
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    project = await db.projects.find_one({"id": project_id, "user_id": current_user["id"]}, {"_id": 0})
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    user = await db.users.find_one({"id": current_user["id"]}, {"_id": 0})
     settings = user.get("settings", {})
     ai_provider = settings.get("ai_provider", "openai")
     ai_model = settings.get("ai_model", "gpt-5.2")
     
-    # Update task status
-    await db.tasks.update_one(
-        {"id": task_id},
-        {"$set": {"status": "in_progress", "updated_at": datetime.now(timezone.utc).isoformat()}}
-    )
-    
     try:
-        from emergentintegrations.llm.chat import LlmChat, UserMessage
+        # The status write and both context lookups are independent
+        _, context_files, repo_names = await asyncio.gather(
+            db.tasks.update_one(
+                {"id": task_id},
+                {"$set": {"status": "in_progress", "updated_at": datetime.now(timezone.utc).isoformat()}}
+            ),
+            db.project_files.find(
+                {"project_id": project_id, **PROJECT_FILE_HAS_CONTENT}, PROJECT_FILE_PROJECTION
+            ).limit(30).to_list(30),
+            github_repo_root_names(project, user)
+        )
         
         # Build context with existing project files
         project_context = ""
-        if project.get("files"):
-            project_context = "\n\nExisting project files:\n"
-            for f in project["files"][:30]:
-                project_context += f"\n--- {f['path']} ---\n{f['content'][:3000]}\n"
+        if context_files:
+            project_context = "\n\nExisting project files:\n" + "".join(
+                f"\n--- {f['path']} ---\n{file_content(f)[:3000]}\n" for f in context_files
+            )
         
-        # If GitHub project, fetch some key files for context
-        if project["source_type"] == "github" and user.get("github_access_token"):
-            gh = GitHubService(user["github_access_token"])
-            try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(
-                        f"https://api.github.com/repos/{project['github_owner']}/{project['github_repo']}/contents",
-                        headers={"Authorization": f"Bearer {user['github_access_token']}"}
-                    )
-                    if response.status_code == 200:
-                        contents = response.json()
-                        key_files = [item for item in contents if item["type"] == "file" and 
-                                   any(item["name"].endswith(ext) for ext in ['.json', '.yaml', '.yml', '.md', '.php', '.vue', '.dart'])][:10]
-                        project_context = f"\n\nRepository structure: {[item['name'] for item in contents]}\n"
-            except Exception as e:
-                logger.warning(f"Could not fetch GitHub context: {e}")
+        # For GitHub projects the repository structure is the context
+        if repo_names is not None:
+            project_context = f"\n\nRepository structure: {repo_names}\n"
         
         tech_stack_str = ', '.join(project.get('tech_stack', ['general']))
         
-        # Create AI developer prompt
-        system_prompt = f"""You are an expert {tech_stack_str} developer and AI Software Engineer.
-You are working on the project: {project['name']}
-Project description: {project.get('description', 'No description')}
-Project summary: {project.get('summary', 'Not analyzed yet')}
-
-Your task is to implement the requested feature or fix by generating ACTUAL CODE FILES.
-
-CRITICAL: You MUST output code in this EXACT format for each file:
-
-```path/to/filename.ext
-[complete file content here]
-```
-
-For example:
-```app/Http/Controllers/UserController.php
-<?php
-
-namespace App\\Http\\Controllers;
-
-class UserController extends Controller
-{{
-    public function index()
-    {{
-        return view('users.index');
-    }}
-}}
-```
-
-```resources/views/users/index.blade.php
-@extends('layouts.app')
-
-@section('content')
-<div class="container">
-    <h1>Users</h1>
-</div>
-@endsection
-```
-
-Rules:
-1. ALWAYS use the format ```filepath.ext followed by complete code
-2. Include ALL necessary files to make the feature work
-3. Create any missing directories/folders by including the full path
-4. For Laravel: include controllers, models, migrations, views, routes as needed
-5. For Vue.js: include components, views, store modules, routes as needed  
-6. For Flutter: include screens, widgets, models, services as needed
-7. Make the code production-ready and complete
-8. Include proper imports and dependencies"""
+        system_prompt = TASK_SYSTEM_PROMPT.format(
+            tech_stack=tech_stack_str,
+            name=project['name'],
+            description=project.get('description', 'No description'),
+            summary=project.get('summary', 'Not analyzed yet')
+        )
 
         chat = LlmChat(
             api_key=EMERGENT_LLM_KEY,
@@ -1502,7 +2425,8 @@ Please implement this task by providing ALL the necessary code files. Remember t
 Generate complete, working code that can be directly committed to the repository."""
         )
         
-        ai_response = await chat.send_message(user_message)
+        async with llm_semaphore:
+            ai_response = await chat.send_message(user_message)
         
         # Parse the AI response to extract file changes
         files_changed = parse_ai_code_response(ai_response)
@@ -1514,96 +2438,73 @@ Generate complete, working code that can be directly committed to the repository
         
         pr_id = None
         pr_data = None
+        # PR and project writes, run together with the final task update
+        pending_writes = []
+        # One completion timestamp shared by the PR, project and task writes
+        now = datetime.now(timezone.utc).isoformat()
         
-        # If GitHub project, push to repository and create PR
+        # If GitHub project, record the PR now and push it to GitHub after
+        # responding; the record stays "pending" until GitHub answers
         if project["source_type"] == "github" and user.get("github_access_token") and files_changed:
-            gh = GitHubService(user["github_access_token"])
-            owner = project["github_owner"]
-            repo = project["github_repo"]
             default_branch = project.get("github_default_branch", "main")
+            pr_id = new_id()
+            pr_doc = {
+                "id": pr_id,
+                "project_id": project_id,
+                "user_id": user["id"],
+                "task_id": task_id,
+                "title": f"feat: {task['title']}",
+                "description": task.get('description', ''),
+                "branch_name": branch_name,
+                "base_branch": default_branch,
+                "status": "pending",
+                "github_pr_number": None,
+                "github_pr_url": None,
+                "files_changed": files_changed,
+                "created_at": now,
+                "updated_at": now
+            }
             
-            # Create a new branch
-            branch_created = await gh.create_branch(owner, repo, branch_name, default_branch)
+            # Copied before insert_one adds _id to pr_doc
+            pr_data = dict(pr_doc)
+            pending_writes.append(db.pull_requests.insert_one(pr_doc))
             
-            if branch_created:
-                # Commit all files to the new branch
-                commit_success = await gh.commit_multiple_files(
-                    owner, repo, branch_name,
-                    files_changed,
-                    f"feat: {task['title']}\n\nImplemented by DevAI"
-                )
-                
-                if commit_success:
-                    # Create pull request
-                    pr_result = await gh.create_pull_request(
-                        owner, repo,
-                        title=f"feat: {task['title']}",
-                        body=f"## Task\n{task['title']}\n\n## Description\n{task.get('description', 'No description')}\n\n## Changes\nThis PR includes {len(files_changed)} file(s):\n" + 
-                             "\n".join([f"- `{f['path']}`" for f in files_changed]) +
-                             "\n\n---\n*Generated by DevAI*",
-                        head=branch_name,
-                        base=default_branch
-                    )
-                    
-                    if pr_result:
-                        # Create PR record in database
-                        pr_id = str(uuid.uuid4())
-                        now = datetime.now(timezone.utc).isoformat()
-                        
-                        pr_doc = {
-                            "id": pr_id,
-                            "project_id": project_id,
-                            "task_id": task_id,
-                            "title": f"feat: {task['title']}",
-                            "description": task.get('description', ''),
-                            "branch_name": branch_name,
-                            "base_branch": default_branch,
-                            "status": "open",
-                            "github_pr_number": pr_result["number"],
-                            "github_pr_url": pr_result["url"],
-                            "files_changed": files_changed,
-                            "created_at": now,
-                            "updated_at": now
-                        }
-                        
-                        await db.pull_requests.insert_one(pr_doc)
-                        # Remove MongoDB _id before returning
-                        pr_data = {k: v for k, v in pr_doc.items() if k != "_id"}
+            background_tasks.add_task(
+                push_pull_request_to_github,
+                pr_id, user["github_access_token"], project["github_owner"], project["github_repo"],
+                default_branch, branch_name, task, files_changed
+            )
         
         # For uploaded/manual projects, save files directly to project
         elif project["source_type"] in ["upload", "manual"] and files_changed:
-            existing_files = project.get("files", [])
-            
-            for new_file in files_changed:
-                # Check if file exists and update, or add new
-                existing_idx = next((i for i, f in enumerate(existing_files) if f["path"] == new_file["path"]), None)
-                if existing_idx is not None:
-                    existing_files[existing_idx]["content"] = new_file["content"]
-                    existing_files[existing_idx]["size"] = len(new_file["content"])
-                else:
-                    existing_files.append({
-                        "path": new_file["path"],
-                        "content": new_file["content"],
-                        "size": len(new_file["content"])
-                    })
+            # Update changed files in place, or add new ones
+            result = await db.project_files.bulk_write([
+                UpdateOne(
+                    {"project_id": project_id, "path": new_file["path"]},
+                    {
+                        "$set": {"content_z": compress_file_content(new_file["content"]), "size": len(new_file["content"])},
+                        "$unset": {"content": ""}
+                    },
+                    upsert=True
+                )
+                for new_file in files_changed
+            ], ordered=False)
             
-            # Update project with new files
-            await db.projects.update_one(
+            # Only upserts add rows, so the count moves by that many without a recount
+            pending_writes.append(db.projects.update_one(
                 {"id": project_id},
-                {"$set": {
-                    "files": existing_files,
-                    "file_count": len(existing_files),
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                }}
-            )
+                {
+                    "$inc": {"file_count": result.upserted_count},
+                    "$set": {"updated_at": now}
+                }
+            ))
             
             # Create a local "PR" record for tracking
-            pr_id = str(uuid.uuid4())
-            now = datetime.now(timezone.utc).isoformat()
-            
+            pr_id = new_id()
             pr_doc = {
                 "id": pr_id,
                 "project_id": project_id,
+                "user_id": user["id"],
                 "task_id": task_id,
                 "title": f"feat: {task['title']}",
                 "description": task.get('description', ''),
@@ -1617,21 +2518,20 @@ Generate complete, working code that can be directly committed to the repository
                 "updated_at": now
             }
             
-            await db.pull_requests.insert_one(pr_doc)
-            # Remove MongoDB _id before returning
-            pr_data = {k: v for k, v in pr_doc.items() if k != "_id"}
+            pr_data = dict(pr_doc)
+            pending_writes.append(db.pull_requests.insert_one(pr_doc))
         
         # Update task with response and files
-        await db.tasks.update_one(
+        await asyncio.gather(*pending_writes, db.tasks.update_one(
             {"id": task_id},
             {"$set": {
                 "status": "completed",
                 "ai_response": ai_response,
                 "pr_id": pr_id,
                 "files_changed": files_changed,
-                "updated_at": datetime.now(timezone.utc).isoformat()
+                "updated_at": now
             }}
-        )
+        ))
         
         return {
             "status": "completed",
@@ -1656,38 +2556,38 @@ Generate complete, working code that can be directly committed to the repository
 
 @api_router.get("/projects/{project_id}/prs", response_model=List[PRResponse])
 async def list_pull_requests(project_id: str, current_user: dict = Depends(get_current_user)):
-    project = await db.projects.find_one({"id": project_id, "user_id": current_user["id"]}, {"_id": 0})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    prs = await db.pull_requests.find({"project_id": project_id}, {"_id": 0}).sort("created_at", -1).to_list(100)
-    
-    return [
-        PRResponse(
-            id=pr["id"],
-            project_id=pr["project_id"],
-            task_id=pr["task_id"],
-            title=pr["title"],
-            description=pr.get("description", ""),
-            branch_name=pr["branch_name"],
-            base_branch=pr.get("base_branch", "main"),
-            status=pr["status"],
-            github_pr_number=pr.get("github_pr_number"),
-            github_pr_url=pr.get("github_pr_url"),
-            files_changed=pr.get("files_changed", []),
-            created_at=format_datetime(pr["created_at"]),
-            updated_at=format_datetime(pr["updated_at"])
-        )
+    await ensure_project_owner(project_id, current_user["id"])
+    
+    prs = await db.pull_requests.find({"project_id": project_id}, PR_LIST_PROJECTION).sort("created_at", -1).to_list(100)
+    
+    return ORJSONResponse([
+        {
+            "id": pr["id"],
+            "project_id": pr["project_id"],
+            "task_id": pr["task_id"],
+            "title": pr["title"],
+            "description": pr.get("description", ""),
+            "branch_name": pr["branch_name"],
+            "base_branch": pr.get("base_branch", "main"),
+            "status": pr["status"],
+            "github_pr_number": pr.get("github_pr_number"),
+            "github_pr_url": pr.get("github_pr_url"),
+            "files_changed": pr.get("files_changed", []),
+            "created_at": pr["created_at"],
+            "updated_at": pr["updated_at"]
+        }
         for pr in prs
-    ]
+    ])
 
 @api_router.get("/projects/{project_id}/prs/{pr_id}", response_model=PRResponse)
 async def get_pull_request(project_id: str, pr_id: str, current_user: dict = Depends(get_current_user)):
-    pr = await db.pull_requests.find_one({"id": pr_id, "project_id": project_id}, {"_id": 0})
+    pr = await db.pull_requests.find_one(
+        {"id": pr_id, "project_id": project_id, "user_id": current_user["id"]}, {"_id": 0}
+    )
     if not pr:
         raise HTTPException(status_code=404, detail="Pull request not found")
     
-    return PRResponse(
+    return PRResponse.model_construct(
         id=pr["id"],
         project_id=pr["project_id"],
         task_id=pr["task_id"],
@@ -1699,18 +2599,22 @@ async def get_pull_request(project_id: str, pr_id: str, current_user: dict = Dep
         github_pr_number=pr.get("github_pr_number"),
         github_pr_url=pr.get("github_pr_url"),
         files_changed=pr.get("files_changed", []),
-        created_at=format_datetime(pr["created_at"]),
-        updated_at=format_datetime(pr["updated_at"])
+        created_at=pr["created_at"],
+        updated_at=pr["updated_at"]
     )
 
-@api_router.post("/projects/{project_id}/prs/{pr_id}/merge")
-async def merge_pull_request(project_id: str, pr_id: str, current_user: dict = Depends(get_current_user)):
-    pr = await db.pull_requests.find_one({"id": pr_id, "project_id": project_id}, {"_id": 0})
-    if not pr:
+@api_router.post("/projects/{project_id}/prs/{pr_id}/merge", status_code=204)
+async def merge_pull_request(project_id: str, pr_id: str, current_user: dict = Depends(get_github_user)):
+    pr, project = await asyncio.gather(
+        db.pull_requests.find_one({"id": pr_id, "project_id": project_id, "user_id": current_user["id"]}, {"_id": 0}),
+        db.projects.find_one(
+            {"id": project_id, "user_id": current_user["id"]}, {"_id": 0, "github_owner": 1, "github_repo": 1}
+        )
+    )
+    if not pr or not project:
         raise HTTPException(status_code=404, detail="Pull request not found")
     
-    project = await db.projects.find_one({"id": project_id}, {"_id": 0})
-    user = await db.users.find_one({"id": current_user["id"]}, {"_id": 0})
+    user = current_user
     
     # If GitHub PR, merge on GitHub
     if pr.get("github_pr_number") and user.get("github_connected") and user.get("github_access_token"):
@@ -1731,15 +2635,17 @@ async def merge_pull_request(project_id: str, pr_id: str, current_user: dict = D
         {"$set": {"status": "merged", "updated_at": datetime.now(timezone.utc).isoformat()}}
     )
     
-    return {"message": "Pull request merged successfully"}
+    return Response(status_code=204)
 
-@api_router.post("/projects/{project_id}/prs/{pr_id}/close")
+@api_router.post("/projects/{project_id}/prs/{pr_id}/close", status_code=204)
 async def close_pull_request(project_id: str, pr_id: str, current_user: dict = Depends(get_current_user)):
-    await db.pull_requests.update_one(
-        {"id": pr_id, "project_id": project_id},
+    result = await db.pull_requests.update_one(
+        {"id": pr_id, "project_id": project_id, "user_id": current_user["id"]},
         {"$set": {"status": "closed", "updated_at": datetime.now(timezone.utc).isoformat()}}
     )
-    return {"message": "Pull request closed"}
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Pull request not found")
+    return Response(status_code=204)
 
 # ======================
 # SETTINGS ENDPOINTS
@@ -1747,8 +2653,7 @@ async def close_pull_request(project_id: str, pr_id: str, current_user: dict = D
 
 @api_router.get("/settings", response_model=UserSettings)
 async def get_settings(current_user: dict = Depends(get_current_user)):
-    user = await db.users.find_one({"id": current_user["id"]}, {"_id": 0})
-    settings = user.get("settings", {})
+    settings = current_user.get("settings", {})
     
     return UserSettings(
         ai_model=settings.get("ai_model", "gpt-5.2"),
@@ -1758,20 +2663,19 @@ async def get_settings(current_user: dict = Depends(get_current_user)):
 
 @api_router.put("/settings", response_model=UserSettings)
 async def update_settings(data: SettingsUpdate, current_user: dict = Depends(get_current_user)):
-    user = await db.users.find_one({"id": current_user["id"]}, {"_id": 0})
-    settings = user.get("settings", {})
+    # Copy: current_user may be the cached document
+    settings = dict(current_user.get("settings") or {})
+    update = {"updated_at": datetime.now(timezone.utc).isoformat()}
     
     if data.ai_model is not None:
-        settings["ai_model"] = data.ai_model
+        settings["ai_model"] = update["settings.ai_model"] = data.ai_model
     if data.ai_provider is not None:
-        settings["ai_provider"] = data.ai_provider
+        settings["ai_provider"] = update["settings.ai_provider"] = data.ai_provider
     if data.theme is not None:
-        settings["theme"] = data.theme
+        settings["theme"] = update["settings.theme"] = data.theme
     
-    await db.users.update_one(
-        {"id": current_user["id"]},
-        {"$set": {"settings": settings, "updated_at": datetime.now(timezone.utc).isoformat()}}
-    )
+    await db.users.update_one({"id": current_user["id"]}, {"$set": update})
+    invalidate_user_cache(current_user["id"])
     
     return UserSettings(
         ai_model=settings.get("ai_model", "gpt-5.2"),
@@ -1783,21 +2687,37 @@ async def update_settings(data: SettingsUpdate, current_user: dict = Depends(get
 # DASHBOARD ENDPOINTS
 # ======================
 
+# Task and PR status counts are answered from these indexes alone (no document fetch)
+TASK_STATUS_INDEX = [("user_id", 1), ("status", 1), ("updated_at", -1)]
+PR_STATUS_INDEX = [("user_id", 1), ("status", 1)]
+
 @api_router.get("/dashboard/stats")
 async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
     user_id = current_user["id"]
     
-    projects_count = await db.projects.count_documents({"user_id": user_id})
-    tasks_pending = await db.tasks.count_documents({"user_id": user_id, "status": "pending"})
-    tasks_in_progress = await db.tasks.count_documents({"user_id": user_id, "status": "in_progress"})
-    tasks_completed = await db.tasks.count_documents({"user_id": user_id, "status": "completed"})
-    
-    project_ids = [p["id"] async for p in db.projects.find({"user_id": user_id}, {"id": 1, "_id": 0})]
+    # PRs carry their owner's user_id, so all three counts are independent
+    # index scans that run concurrently
+    projects_count, task_groups, pr_groups = await asyncio.gather(
+        db.projects.count_documents({"user_id": user_id}),
+        db.tasks.aggregate([
+            {"$match": {"user_id": user_id}},
+            {"$group": {"_id": "$status", "n": {"$sum": 1}}}
+        ], hint=TASK_STATUS_INDEX).to_list(None),
+        db.pull_requests.aggregate([
+            {"$match": {"user_id": user_id, "status": {"$in": ["open", "merged"]}}},
+            {"$group": {"_id": "$status", "n": {"$sum": 1}}}
+        ], hint=PR_STATUS_INDEX).to_list(None)
+    )
+    task_counts = {g["_id"]: g["n"] for g in task_groups}
+    tasks_pending = task_counts.get("pending", 0)
+    tasks_in_progress = task_counts.get("in_progress", 0)
+    tasks_completed = task_counts.get("completed", 0)
     
-    prs_open = await db.pull_requests.count_documents({"project_id": {"$in": project_ids}, "status": "open"})
-    prs_merged = await db.pull_requests.count_documents({"project_id": {"$in": project_ids}, "status": "merged"})
+    pr_counts = {g["_id"]: g["n"] for g in pr_groups}
+    prs_open = pr_counts.get("open", 0)
+    prs_merged = pr_counts.get("merged", 0)
     
-    return {
+    return ORJSONResponse({
         "projects": projects_count,
         "tasks": {
             "pending": tasks_pending,
@@ -1809,38 +2729,78 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
             "open": prs_open,
             "merged": prs_merged
         }
-    }
+    })
 
 @api_router.get("/dashboard/recent")
 async def get_recent_activity(current_user: dict = Depends(get_current_user)):
     user_id = current_user["id"]
     
-    recent_projects = await db.projects.find(
-        {"user_id": user_id},
-        {"_id": 0, "files": 0}
-    ).sort("updated_at", -1).limit(5).to_list(5)
-    
-    recent_tasks = await db.tasks.find(
-        {"user_id": user_id},
-        {"_id": 0}
-    ).sort("updated_at", -1).limit(5).to_list(5)
-    
-    project_ids = [p["id"] for p in recent_projects]
-    
-    recent_prs = await db.pull_requests.find(
-        {"project_id": {"$in": project_ids}},
-        {"_id": 0}
-    ).sort("updated_at", -1).limit(5).to_list(5)
+    # Activity cards only show names and statuses, so the AI summary, AI
+    # response and generated file contents stay in the database
+    # Every collection carries the owner's user_id, so the three feeds are
+    # independent queries
+    recent_projects, recent_tasks, recent_prs = await asyncio.gather(
+        db.projects.find(
+            {"user_id": user_id},
+            {"_id": 0, "summary": 0}
+        ).sort("updated_at", -1).limit(5).to_list(5),
+        db.tasks.find(
+            {"user_id": user_id},
+            {"_id": 0, "ai_response": 0, "files_changed": 0}
+        ).sort("updated_at", -1).limit(5).to_list(5),
+        db.pull_requests.find(
+            {"user_id": user_id},
+            {"_id": 0, "files_changed": 0}
+        ).sort("updated_at", -1).limit(5).to_list(5)
+    )
     
-    return {
+    # Plain Mongo documents; orjson handles any datetime values natively
+    return ORJSONResponse({
         "projects": recent_projects,
         "tasks": recent_tasks,
         "pull_requests": recent_prs
-    }
+    })
+
+class UploadSizeLimitMiddleware:
+    """Reject upload bodies over MAX_UPLOAD_BYTES before they are spooled to disk"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != "/api/projects/upload":
+            await self.app(scope, receive, send)
+            return
+        
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+            response = ORJSONResponse({"detail": "Upload too large"}, status_code=413)
+            await response(scope, receive, send)
+            return
+        
+        # Chunked bodies carry no length up front, so count bytes as they arrive
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="Upload too large")
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+@app.exception_handler(httpx.TimeoutException)
+async def github_timeout_handler(request, exc):
+    # A stalled GitHub call fails fast instead of surfacing as a 500
+    return ORJSONResponse({"detail": "GitHub request timed out"}, status_code=504)
 
 # Include router and middleware
 app.include_router(api_router)
 
+app.add_middleware(UploadSizeLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -1849,6 +2809,134 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def warm_db_pool():
+    await db.command("ping")
+
+@app.on_event("startup")
+async def create_indexes():
+    await db.users.create_index("id", unique=True)
+    # Login and register look users up by email
+    await db.users.create_index("email", unique=True)
+    await db.refresh_tokens.create_index(
+        [("user_id", 1), ("jti", 1)], unique=True, partialFilterExpression={"jti": {"$exists": True}}
+    )
+    # Legacy rows stored the whole token; not unique since two logins in the
+    # same second yielded the same token
+    await db.refresh_tokens.create_index([("user_id", 1), ("token", 1)])
+    await db.refresh_tokens.create_index("expires_at", expireAfterSeconds=0)
+    # Ids are unique per collection, so lookups that also filter by owner
+    # still resolve through these single-field indexes
+    await db.projects.create_index("id", unique=True)
+    await db.tasks.create_index("id", unique=True)
+    await db.pull_requests.create_index("id", unique=True)
+    # List endpoints filter by owner and sort newest first
+    await db.projects.create_index([("user_id", 1), ("created_at", -1)])
+    # Importing from GitHub first checks the user has no project for the repo
+    await db.projects.create_index([("user_id", 1), ("github_owner", 1), ("github_repo", 1)])
+    await db.tasks.create_index([("project_id", 1), ("created_at", -1)])
+    await db.pull_requests.create_index([("project_id", 1), ("created_at", -1)])
+    await db.project_files.create_index([("project_id", 1), ("path", 1)])
+    # Dashboard counts filter on owner and status
+    await db.tasks.create_index(TASK_STATUS_INDEX)
+    await db.pull_requests.create_index(PR_STATUS_INDEX)
+    # Recent activity matches only the owner, so the status key in the count
+    # indexes would leave updated_at unsorted; these return the newest directly
+    await db.projects.create_index([("user_id", 1), ("updated_at", -1)])
+    await db.tasks.create_index([("user_id", 1), ("updated_at", -1)])
+    await db.pull_requests.create_index([("user_id", 1), ("updated_at", -1)])
+    await db.pull_requests.create_index([("project_id", 1), ("status", 1), ("updated_at", -1)])
+
+@app.on_event("startup")
+async def migrate_embedded_project_files():
+    """Move files still embedded in older project documents into project_files."""
+    async for project in db.projects.find({"files": {"$exists": True}}, {"_id": 0, "id": 1, "files": 1}):
+        if project["files"]:
+            await db.project_files.bulk_write([
+                UpdateOne(
+                    {"project_id": project["id"], "path": f["path"]},
+                    {"$setOnInsert": {"content_z": compress_file_content(f.get("content", "")), "size": f.get("size", 0)}},
+                    upsert=True
+                )
+                for f in project["files"]
+            ], ordered=False)
+        await db.projects.update_one({"id": project["id"]}, {"$unset": {"files": ""}})
+    
+    # Path lists move over as path-only entries next to the stored files
+    async for project in db.projects.find({"file_list": {"$exists": True}}, {"_id": 0, "id": 1, "file_list": 1}):
+        if project["file_list"]:
+            await db.project_files.bulk_write([
+                UpdateOne(
+                    {"project_id": project["id"], "path": f["path"]},
+                    {"$setOnInsert": {"size": f.get("size", 0)}},
+                    upsert=True
+                )
+                for f in project["file_list"]
+            ], ordered=False)
+        await db.projects.update_one({"id": project["id"]}, {"$unset": {"file_list": ""}})
+
+@app.on_event("startup")
+async def migrate_pull_request_owner():
+    """Copy the project owner's user_id onto pull requests created before PRs carried it."""
+    project_ids = await db.pull_requests.distinct("project_id", {"user_id": {"$exists": False}})
+    async for project in db.projects.find({"id": {"$in": project_ids}}, {"_id": 0, "id": 1, "user_id": 1}):
+        await db.pull_requests.update_many(
+            {"project_id": project["id"], "user_id": {"$exists": False}},
+            {"$set": {"user_id": project["user_id"]}}
+        )
+
+@app.on_event("startup")
+async def migrate_timestamp_strings():
+    """Rewrite BSON-date created_at/updated_at values as the ISO strings responses return as-is."""
+    as_string = {
+        field: {"$cond": [
+            {"$eq": [{"$type": f"${field}"}, "date"]},
+            {"$dateToString": {"date": f"${field}", "format": "%Y-%m-%dT%H:%M:%S.%L000+00:00"}},
+            f"${field}"
+        ]}
+        for field in ("created_at", "updated_at")
+    }
+    for collection in (db.users, db.projects, db.tasks, db.pull_requests):
+        await collection.update_many(
+            {"$or": [{"created_at": {"$type": "date"}}, {"updated_at": {"$type": "date"}}]},
+            [{"$set": as_string}]
+        )
+
+@app.on_event("startup")
+async def migrate_refresh_token_expiry():
+    """Convert refresh tokens stored with ISO-string expiry so the TTL index reaps them."""
+    legacy = {"expires_at": {"$type": "string"}}
+    await db.refresh_tokens.delete_many({
+        "expires_at": {"$type": "string", "$lt": datetime.now(timezone.utc).isoformat()}
+    })
+    await db.refresh_tokens.update_many(legacy, [{"$set": {"expires_at": {"$toDate": "$expires_at"}}}])
+
+@app.on_event("startup")
+async def startup_http_client():
+    global github_http
+    # HTTP/2 multiplexes concurrent GitHub calls over a few TLS connections
+    github_http = httpx.AsyncClient(
+        base_url=GITHUB_API_URL,
+        transport=GitHubRateLimitTransport(httpx.AsyncHTTPTransport(
+            http2=True,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100, keepalive_expiry=30.0)
+        )),
+        timeout=httpx.Timeout(6.0, connect=2.0)
+    )
+
+@app.on_event("startup")
+async def startup_zip_scan_pool():
+    global zip_scan_pool
+    zip_scan_pool = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 1) // 2))
+
+@app.on_event("shutdown")
+async def shutdown_http_client():
+    await github_http.aclose()
+
+@app.on_event("shutdown")
+async def shutdown_zip_scan_pool():
+    zip_scan_pool.shutdown(wait=False, cancel_futures=True)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
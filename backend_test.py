@@ -1,73 +1,149 @@
 #!/usr/bin/env python3
 
+import hashlib
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import sys
-import json
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import uuid
+
+# Matches the session's pool size, so concurrent tests never wait for a connection
+MAX_PARALLEL_TESTS = 4
+
+# Pinned digests of files_changed ("task_execution_files", "pr_files") for
+# regression runs against a deterministic model; unpinned keys keep the
+# length checks only
+EXPECTED_FILES_DIGESTS = {}
+
+def files_digest(files_changed):
+    """Stable content hash of a files_changed array"""
+    return hashlib.blake2b(
+        orjson.dumps(files_changed, option=orjson.OPT_SORT_KEYS), digest_size=16
+    ).hexdigest()
+
+def matches_pinned_digest(key, files_changed):
+    """Compare against the pinned digest, if there is one"""
+    expected = EXPECTED_FILES_DIGESTS.get(key)
+    if expected is None:
+        return True
+    actual = files_digest(files_changed)
+    if actual != expected:
+        log(f"   ❌ {key} digest {actual} does not match pinned {expected}")
+        return False
+    log(f"   ✓ {key} digest matches")
+    return True
+
+# Each test's output lines, collected per worker thread and written in one go
+_output = threading.local()
+_output_lock = threading.Lock()
+
+def log(line):
+    """Buffer a line for the running test, or write it straight out outside one"""
+    lines = getattr(_output, 'lines', None)
+    if lines is None:
+        print(line)
+    else:
+        lines.append(line)
+
+def run_buffered(test_func):
+    """Run a test and write its output as one block, so concurrent tests don't interleave"""
+    _output.lines = []
+    try:
+        return test_func()
+    finally:
+        lines, _output.lines = _output.lines, None
+        with _output_lock:
+            sys.stdout.write("\n".join(lines) + "\n")
+            sys.stdout.flush()
 
 class DevAIAPITester:
     def __init__(self, base_url="https://smartdev-ai-1.preview.emergentagent.com"):
         self.base_url = base_url
+        self._base_api = base_url.rstrip('/') + '/api/'
         self.token = None
         self.refresh_token = None
         self.user_id = None
+        # One identity per tester, so register and login use the same credentials
+        self._uid = uuid.uuid4().hex[:8]
+        self._email = f"test{self._uid}@example.com"
+        self._password = "testpass123"
         self.tests_run = 0
         self.tests_passed = 0
+        # Guards the counters when a phase's tests run on several threads
+        self._count_lock = threading.Lock()
         self.project_id = None
+        self.task_id = None
+        # (method, endpoint, payload) of authenticated calls that passed, replayed
+        # with mutated tokens once the nominal run is done
+        self._recorded = []
+        # One keep-alive connection for the whole run instead of a new TLS
+        # handshake per request; rate limits and transient gateway errors are
+        # retried with backoff for idempotent methods only (urllib3's default)
+        self.session = requests.Session()
+        self.session.headers.update({'Content-Type': 'application/json'})
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=MAX_PARALLEL_TESTS,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=[429, 502, 503, 504],
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
     def run_test(self, name, method, endpoint, expected_status, data=None, headers=None):
         """Run a single API test"""
-        url = f"{self.base_url}/api/{endpoint}"
-        test_headers = {'Content-Type': 'application/json'}
-        
-        if self.token:
-            test_headers['Authorization'] = f'Bearer {self.token}'
-        
-        if headers:
-            test_headers.update(headers)
+        url = self._base_api + endpoint
+        # Encoded once with orjson; the session already sends the JSON content type
+        payload = orjson.dumps(data) if data is not None else None
 
-        self.tests_run += 1
-        print(f"\n🔍 Testing {name}...")
-        print(f"   URL: {url}")
+        with self._count_lock:
+            self.tests_run += 1
+        log(f"\n🔍 Testing {name}...")
+        log(f"   URL: {url}")
         
         try:
-            if method == 'GET':
-                response = requests.get(url, headers=test_headers, timeout=30)
-            elif method == 'POST':
-                response = requests.post(url, json=data, headers=test_headers, timeout=30)
-            elif method == 'PUT':
-                response = requests.put(url, json=data, headers=test_headers, timeout=30)
-            elif method == 'DELETE':
-                response = requests.delete(url, headers=test_headers, timeout=30)
+            response = self.session.request(method, url, data=payload, headers=headers, timeout=30)
+            # Decoded once, straight from the bytes; empty and non-JSON bodies stay {}
+            body = {}
+            if response.content and 'json' in response.headers.get('Content-Type', ''):
+                body = orjson.loads(response.content)
 
             success = response.status_code == expected_status
             if success:
-                self.tests_passed += 1
-                print(f"✅ Passed - Status: {response.status_code}")
-                try:
-                    return success, response.json() if response.content else {}
-                except:
-                    return success, {}
+                with self._count_lock:
+                    self.tests_passed += 1
+                    # Login takes no token, so a mutated one can't be refused there
+                    if ('Authorization' in self.session.headers and endpoint != 'auth/login'
+                            and not endpoint.endswith('/execute')):
+                        self._recorded.append((method, endpoint, payload))
+                log(f"✅ Passed - Status: {response.status_code}")
+                return success, body
             else:
-                print(f"❌ Failed - Expected {expected_status}, got {response.status_code}")
-                try:
-                    error_detail = response.json()
-                    print(f"   Error: {error_detail}")
-                except:
-                    print(f"   Response: {response.text[:200]}")
+                log(f"❌ Failed - Expected {expected_status}, got {response.status_code}")
+                if body:
+                    log(f"   Error: {body}")
+                else:
+                    log(f"   Response: {response.text[:200]}")
                 return False, {}
 
         except Exception as e:
-            print(f"❌ Failed - Error: {str(e)}")
+            log(f"❌ Failed - Error: {str(e)}")
             return False, {}
 
     def test_register(self):
         """Test user registration"""
-        timestamp = datetime.now().strftime('%H%M%S')
         test_data = {
-            "name": f"Test User {timestamp}",
-            "email": f"test{timestamp}@example.com",
-            "password": "testpass123"
+            "name": f"Test User {self._uid}",
+            "email": self._email,
+            "password": self._password
         }
         
         success, response = self.run_test(
@@ -80,19 +156,19 @@ class DevAIAPITester:
         
         if success and 'access_token' in response:
             self.token = response['access_token']
+            self.session.headers['Authorization'] = f'Bearer {self.token}'
             self.refresh_token = response['refresh_token']
             self.user_id = response['user']['id']
-            print(f"   ✓ Token obtained: {self.token[:20]}...")
+            log(f"   ✓ Token obtained: {self.token[:20]}...")
             return True
         return False
 
     def test_login(self):
         """Test user login with existing credentials"""
         # Use the same credentials from registration
-        timestamp = datetime.now().strftime('%H%M%S')
         test_data = {
-            "email": f"test{timestamp}@example.com",
-            "password": "testpass123"
+            "email": self._email,
+            "password": self._password
         }
         
         success, response = self.run_test(
@@ -123,7 +199,7 @@ class DevAIAPITester:
             200
         )
         if success:
-            print(f"   ✓ Stats: {response}")
+            log(f"   ✓ Stats: {response}")
         return success
 
     def test_dashboard_recent(self):
@@ -154,7 +230,7 @@ class DevAIAPITester:
         
         if success and 'id' in response:
             self.project_id = response['id']
-            print(f"   ✓ Project created: {self.project_id}")
+            log(f"   ✓ Project created: {self.project_id}")
             return True
         return False
 
@@ -167,13 +243,13 @@ class DevAIAPITester:
             200
         )
         if success:
-            print(f"   ✓ Found {len(response)} projects")
+            log(f"   ✓ Found {len(response)} projects")
         return success
 
     def test_get_project(self):
         """Test getting specific project"""
         if not self.project_id:
-            print("❌ No project ID available for testing")
+            log("❌ No project ID available for testing")
             return False
             
         success, response = self.run_test(
@@ -187,7 +263,7 @@ class DevAIAPITester:
     def test_create_task(self):
         """Test task creation"""
         if not self.project_id:
-            print("❌ No project ID available for testing")
+            log("❌ No project ID available for testing")
             return False
             
         test_data = {
@@ -208,7 +284,7 @@ class DevAIAPITester:
     def test_list_tasks(self):
         """Test listing tasks"""
         if not self.project_id:
-            print("❌ No project ID available for testing")
+            log("❌ No project ID available for testing")
             return False
             
         success, response = self.run_test(
@@ -219,16 +295,16 @@ class DevAIAPITester:
         )
         if success and len(response) > 0:
             self.task_id = response[0]['id']
-            print(f"   ✓ Task ID stored: {self.task_id}")
+            log(f"   ✓ Task ID stored: {self.task_id}")
         return success
 
     def test_task_execution(self):
         """Test task execution endpoint - should return files_changed array"""
-        if not self.project_id or not hasattr(self, 'task_id'):
-            print("❌ No project ID or task ID available for testing")
+        if not self.project_id or not self.task_id:
+            log("❌ No project ID or task ID available for testing")
             return False
             
-        print("   ⚠️  Note: This test may take 30-60 seconds due to AI processing...")
+        log("   ⚠️  Note: This test may take 30-60 seconds due to AI processing...")
         success, response = self.run_test(
             "Execute Task (AI Generation)",
             "POST",
@@ -240,19 +316,19 @@ class DevAIAPITester:
             # Check if response contains files_changed array
             if 'files_changed' in response:
                 files_count = len(response['files_changed'])
-                print(f"   ✓ Files changed array present: {files_count} files")
+                log(f"   ✓ Files changed array present: {files_count} files")
                 if files_count > 0:
-                    print(f"   ✓ Sample file: {response['files_changed'][0].get('path', 'N/A')}")
-                return True
+                    log(f"   ✓ Sample file: {response['files_changed'][0].get('path', 'N/A')}")
+                return matches_pinned_digest("task_execution_files", response['files_changed'])
             else:
-                print("   ❌ Missing files_changed array in response")
+                log("   ❌ Missing files_changed array in response")
                 return False
         return success
 
     def test_list_pull_requests(self):
         """Test listing pull requests - should return files_changed"""
         if not self.project_id:
-            print("❌ No project ID available for testing")
+            log("❌ No project ID available for testing")
             return False
             
         success, response = self.run_test(
@@ -267,15 +343,15 @@ class DevAIAPITester:
             pr = response[0]
             if 'files_changed' in pr:
                 files_count = len(pr['files_changed'])
-                print(f"   ✓ PR files_changed array present: {files_count} files")
+                log(f"   ✓ PR files_changed array present: {files_count} files")
                 if files_count > 0:
-                    print(f"   ✓ Sample PR file: {pr['files_changed'][0].get('path', 'N/A')}")
-                return True
+                    log(f"   ✓ Sample PR file: {pr['files_changed'][0].get('path', 'N/A')}")
+                return matches_pinned_digest("pr_files", pr['files_changed'])
             else:
-                print("   ❌ Missing files_changed array in PR response")
+                log("   ❌ Missing files_changed array in PR response")
                 return False
         elif success:
-            print("   ✓ No PRs yet (expected after task execution)")
+            log("   ✓ No PRs yet (expected after task execution)")
             return True
         return success
 
@@ -288,7 +364,7 @@ class DevAIAPITester:
             200
         )
         if success:
-            print(f"   ✓ Settings: {response}")
+            log(f"   ✓ Settings: {response}")
         return success
 
     def test_settings_update(self):
@@ -318,44 +394,106 @@ class DevAIAPITester:
         )
         # This should fail, so we count it as success if it returns 400
         if not success and response == {}:
-            print("   ✓ Expected failure due to missing GitHub config")
-            self.tests_passed += 1
+            log("   ✓ Expected failure due to missing GitHub config")
+            with self._count_lock:
+                self.tests_passed += 1
             return True
         return success
 
+    def replay_with_mutated_token(self, operator, mutator):
+        """Replay the recorded calls with a mutated access token; every one must be refused"""
+        with self._count_lock:
+            self.tests_run += 1
+        log(f"\n🔍 Testing token mutation ({operator}) on {len(self._recorded)} recorded calls...")
+        mutated = {'Authorization': 'Bearer ' + mutator(self.token)}
+        accepted = []
+        for method, endpoint, payload in self._recorded:
+            # Per-call header, so the session keeps the valid token for other threads
+            response = self.session.request(
+                method, self._base_api + endpoint, data=payload, headers=mutated, timeout=30
+            )
+            if response.status_code not in (401, 403):
+                accepted.append(f"{method} {endpoint} -> {response.status_code}")
+        if accepted:
+            log(f"❌ Failed - mutated token not rejected by: {', '.join(accepted)}")
+            return False
+        with self._count_lock:
+            self.tests_passed += 1
+        log("✅ Passed - all calls rejected")
+        return True
+
+def _payload_middle(token):
+    """Index of a character in the middle of a JWT's payload segment"""
+    header_end = token.index('.')
+    return (header_end + token.index('.', header_end + 1)) // 2
+
+def alter_token_char(token):
+    i = _payload_middle(token)
+    return token[:i] + ('B' if token[i] == 'A' else 'A') + token[i + 1:]
+
+def remove_token_char(token):
+    i = _payload_middle(token)
+    return token[:i] + token[i + 1:]
+
+def add_token_char(token):
+    i = _payload_middle(token)
+    return token[:i] + 'A' + token[i:]
+
 def main():
     print("🚀 Starting DevAI API Tests")
     print("=" * 50)
     
     tester = DevAIAPITester()
     
-    # Test sequence
-    tests = [
-        ("User Registration", tester.test_register),
-        ("Get Current User", tester.test_get_me),
-        ("Dashboard Stats", tester.test_dashboard_stats),
-        ("Dashboard Recent", tester.test_dashboard_recent),
-        ("Create Project", tester.test_create_project),
-        ("List Projects", tester.test_list_projects),
-        ("Get Project Details", tester.test_get_project),
-        ("Create Task", tester.test_create_task),
-        ("List Tasks", tester.test_list_tasks),
-        ("Execute Task (AI)", tester.test_task_execution),
-        ("List Pull Requests", tester.test_list_pull_requests),
-        ("Get Settings", tester.test_settings_get),
-        ("Update Settings", tester.test_settings_update),
-        ("GitHub Auth URL (Expected Fail)", tester.test_github_auth_url),
+    # Test sequence: each phase starts once the previous one has finished;
+    # tests within a phase don't depend on each other and run concurrently
+    phases = [
+        [("User Registration", tester.test_register)],
+        [
+            ("User Login", tester.test_login),
+            ("Create Project", tester.test_create_project),
+        ],
+        [
+            ("List Projects", tester.test_list_projects),
+            ("Get Project Details", tester.test_get_project),
+            ("Create Task", tester.test_create_task),
+        ],
+        [("List Tasks", tester.test_list_tasks)],
+        # The AI call takes 30-60 s; the read-only checks run during it
+        [
+            ("Execute Task (AI)", tester.test_task_execution),
+            ("Get Current User", tester.test_get_me),
+            ("Dashboard Stats", tester.test_dashboard_stats),
+            ("Dashboard Recent", tester.test_dashboard_recent),
+            ("Get Settings", tester.test_settings_get),
+            ("GitHub Auth URL (Expected Fail)", tester.test_github_auth_url),
+        ],
+        # Settings change the AI provider, so they are updated only after execution
+        [
+            ("List Pull Requests", tester.test_list_pull_requests),
+            ("Update Settings", tester.test_settings_update),
+        ],
+        # Replays reuse the calls recorded above instead of re-creating
+        # projects and tasks, and skip the AI execution
+        [
+            ("Token Mutation (alter)", lambda: tester.replay_with_mutated_token("alter", alter_token_char)),
+            ("Token Mutation (remove)", lambda: tester.replay_with_mutated_token("remove", remove_token_char)),
+            ("Token Mutation (add)", lambda: tester.replay_with_mutated_token("add", add_token_char)),
+        ],
     ]
     
     failed_tests = []
     
-    for test_name, test_func in tests:
-        try:
-            if not test_func():
-                failed_tests.append(test_name)
-        except Exception as e:
-            print(f"❌ {test_name} - Exception: {str(e)}")
-            failed_tests.append(test_name)
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_TESTS) as pool:
+        for phase in phases:
+            futures = [(test_name, pool.submit(run_buffered, test_func)) for test_name, test_func in phase]
+            for test_name, future in futures:
+                try:
+                    if not future.result():
+                        failed_tests.append(test_name)
+                except Exception as e:
+                    print(f"❌ {test_name} - Exception: {str(e)}")
+                    failed_tests.append(test_name)
     
     # Print results
     print("\n" + "=" * 50)
@@ -279,9 +279,13 @@ function TechBadges({ techStack }) {
   );
 }
 
-function TasksList({ tasks, onExecute, onDelete, executingTaskId }) {
+function TasksList({ tasks, onExecute, onDelete, onLoadDetails, executingTaskId }) {
   const [expanded, setExpanded] = useState({});
-  const toggle = (id) => setExpanded(prev => ({ ...prev, [id]: !prev[id] }));
+  // The list carries file paths only; the AI response and file contents load on first expand
+  const toggle = (task) => {
+    if (!expanded[task.id] && !task.details) onLoadDetails(task.id);
+    setExpanded(prev => ({ ...prev, [task.id]: !prev[task.id] }));
+  };
 
   if (tasks.length === 0) {
     return <div className="text-center py-12 text-muted-foreground"><LuSquareCheck className="h-8 w-8 mx-auto mb-2 opacity-50" /><p>No tasks yet</p></div>;
@@ -306,7 +310,7 @@ function TasksList({ tasks, onExecute, onDelete, executingTaskId }) {
                   {task.pr_id && <Badge className="bg-green-500/20 text-green-500"><LuGitPullRequest className="h-3 w-3 mr-1" />PR</Badge>}
                 </div>
                 {task.description && <p className="text-sm text-muted-foreground mt-1">{task.description}</p>}
-                {(task.ai_response || fc.length > 0) && <Button variant="ghost" size="sm" className="mt-2 text-xs" onClick={() => toggle(task.id)}>{isExp ? 'Hide' : 'Show'} details</Button>}
+                {(task.status === 'completed' || fc.length > 0) && <Button variant="ghost" size="sm" className="mt-2 text-xs" onClick={() => toggle(task)}>{isExp ? 'Hide' : 'Show'} details</Button>}
                 {isExp && task.ai_response && <div className="mt-2 p-3 rounded-lg bg-muted/50 max-h-40 overflow-y-auto"><pre className="text-xs whitespace-pre-wrap font-mono">{task.ai_response}</pre></div>}
                 {isExp && fc.length > 0 && <div className="mt-3"><p className="text-xs text-muted-foreground mb-2">Generated Files:</p><FilesList files={fc} /></div>}
               </div>
@@ -327,9 +331,12 @@ function TasksList({ tasks, onExecute, onDelete, executingTaskId }) {
   );
 }
 
-function PRsList({ prs }) {
+function PRsList({ prs, onLoadDetails }) {
   const [expanded, setExpanded] = useState({});
-  const toggle = (id) => setExpanded(prev => ({ ...prev, [id]: !prev[id] }));
+  const toggle = (pr) => {
+    if (!expanded[pr.id] && !pr.details) onLoadDetails(pr.id);
+    setExpanded(prev => ({ ...prev, [pr.id]: !prev[pr.id] }));
+  };
 
   if (prs.length === 0) {
     return <div className="text-center py-12 text-muted-foreground"><LuGitPullRequest className="h-8 w-8 mx-auto mb-2 opacity-50" /><p>No PRs yet</p></div>;
@@ -360,7 +367,7 @@ function PRsList({ prs }) {
                 {pr.github_pr_url && <a href={pr.github_pr_url} target="_blank" rel="noopener noreferrer" className="inline-flex items-center gap-1 text-sm text-primary hover:underline mt-2"><FaGithub className="h-3 w-3" />GitHub<LuExternalLink className="h-3 w-3" /></a>}
                 {fc.length > 0 && (
                   <div className="mt-3">
-                    <Button variant="ghost" size="sm" className="text-xs" onClick={() => toggle(pr.id)}><LuFileCode className="h-3 w-3 mr-1" />{isExp ? 'Hide' : 'View'} files</Button>
+                    <Button variant="ghost" size="sm" className="text-xs" onClick={() => toggle(pr)}><LuFileCode className="h-3 w-3 mr-1" />{isExp ? 'Hide' : 'View'} files</Button>
                     {isExp && <div className="mt-2"><FilesList files={fc} /></div>}
                   </div>
                 )}
@@ -402,7 +409,12 @@ export function ProjectDetailPage() {
 
   const handleAnalyze = () => {
     setAnalyzing(true);
-    api.post('/projects/' + projectId + '/analyze').then(r => { setProject(p => ({ ...p, summary: r.data.summary, status: 'ready' })); toast.success('Done!'); }).catch(() => toast.error('Failed')).finally(() => setAnalyzing(false));
+    const poll = () => api.get('/projects/' + projectId + '/analyze/status').then(r => {
+      if (r.data.status === 'analyzing') return new Promise(res => setTimeout(res, 2000)).then(poll);
+      if (r.data.status !== 'ready') throw new Error('Analysis failed');
+      setProject(p => ({ ...p, summary: r.data.summary, status: 'ready' })); toast.success('Done!');
+    });
+    api.post('/projects/' + projectId + '/analyze').then(poll).catch(() => toast.error('Failed')).finally(() => setAnalyzing(false));
   };
 
   const handleCreateTask = () => {
@@ -418,7 +430,7 @@ export function ProjectDetailPage() {
     toast.info('AI working...');
     api.post('/projects/' + projectId + '/tasks/' + id + '/execute')
       .then(r => {
-        setTasks(p => p.map(t => t.id === id ? { ...t, status: 'completed', ai_response: r.data.ai_response, files_changed: r.data.files_changed || [], pr_id: r.data.pr_id } : t));
+        setTasks(p => p.map(t => t.id === id ? { ...t, status: 'completed', ai_response: r.data.ai_response, files_changed: r.data.files_changed || [], pr_id: r.data.pr_id, details: true } : t));
         if (r.data.pr_id) api.get('/projects/' + projectId + '/prs').then(x => setPrs(x.data));
         toast.success('Completed!');
       })
@@ -426,6 +438,14 @@ export function ProjectDetailPage() {
       .finally(() => setExecutingTaskId(null));
   };
 
+  const loadTaskDetails = (id) => {
+    api.get('/projects/' + projectId + '/tasks/' + id).then(r => setTasks(p => p.map(t => t.id === id ? { ...r.data, details: true } : t))).catch(() => toast.error('Failed to load details'));
+  };
+
+  const loadPrDetails = (id) => {
+    api.get('/projects/' + projectId + '/prs/' + id).then(r => setPrs(p => p.map(x => x.id === id ? { ...r.data, details: true } : x))).catch(() => toast.error('Failed to load files'));
+  };
+
   const handleDeleteTask = (id) => {
     api.delete('/projects/' + projectId + '/tasks/' + id).then(() => { setTasks(p => p.filter(t => t.id !== id)); toast.success('Deleted'); }).catch(() => toast.error('Failed'));
   };
@@ -519,11 +539,11 @@ export function ProjectDetailPage() {
                   </Dialog>
                 </div>
               </CardHeader>
-              <CardContent><TasksList tasks={tasks} onExecute={handleExecuteTask} onDelete={handleDeleteTask} executingTaskId={executingTaskId} /></CardContent>
+              <CardContent><TasksList tasks={tasks} onExecute={handleExecuteTask} onDelete={handleDeleteTask} onLoadDetails={loadTaskDetails} executingTaskId={executingTaskId} /></CardContent>
             </Card>
           </TabsContent>
           <TabsContent value="prs">
-            <Card><CardHeader><CardTitle className="text-lg">Pull Requests</CardTitle><CardDescription>AI-generated PRs</CardDescription></CardHeader><CardContent><PRsList prs={prs} /></CardContent></Card>
+            <Card><CardHeader><CardTitle className="text-lg">Pull Requests</CardTitle><CardDescription>AI-generated PRs</CardDescription></CardHeader><CardContent><PRsList prs={prs} onLoadDetails={loadPrDetails} /></CardContent></Card>
           </TabsContent>
         </Tabs>
       </div>